@@ -1,10 +1,17 @@
-import csv
-import json
+import hashlib
 import os
+import queue
+import re
+import socket
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Tuple, Optional, Union
+from typing import Callable, Dict, Hashable, Tuple, Optional, Union
 
+import numpy as np
 from flask import Flask, jsonify, request
 from flask_sock import Sock
 
@@ -13,7 +20,16 @@ try:
 except Exception:
     serial = None
 
-from pendulum_processor import PendulumProcessor, decode_ws_message, frame_to_b64, build_plot_and_stats
+from pendulum_processor import (
+    PendulumProcessor,
+    build_plot_and_stats,
+    decode_ws_message,
+    encode_ws_message,
+    frame_to_jpeg_bytes,
+    is_json_message,
+    json_bytes,
+    warm_up_kernels,
+)
 
 
 # -------------------------------------------------------------------
@@ -22,39 +38,347 @@ from pendulum_processor import PendulumProcessor, decode_ws_message, frame_to_b6
 
 app = Flask(__name__)
 sock = Sock(app)
-session_store: Dict[str, PendulumProcessor] = {}
-session_csv_writers: Dict[str, Tuple[Path, object, csv.writer]] = {}
+
+SESSION_MAXSIZE = 1024  # sesiones recordadas como máximo
+SESSION_TTL = 3600.0  # s sin actividad antes de olvidar una sesión
+
+
+class SessionCache(MutableMapping):
+    """
+    Dict acotado para el estado por sesión: LRU de `maxsize` entradas que además
+    caducan `ttl` segundos después del último acceso. `on_evict(key, value)` se
+    llama al expulsar una entrada (p. ej. para cerrar su fichero). Las claves
+    fijadas con pin() (p. ej. sesiones con un WebSocket abierto) no se expulsan
+    hasta su unpin().
+    """
+
+    def __init__(self, maxsize: int, ttl: float, on_evict: Optional[Callable[[str, object], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._pinned: Dict[str, int] = {}  # clave -> nº de pin() pendientes
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._expire()
+            _, value = self._data[key]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self._expire()
+            for old_key in list(self._data)[:-1]:  # de la menos a la más reciente, salvo la nueva
+                if len(self._data) <= self.maxsize:
+                    break
+                if old_key in self._pinned:
+                    continue
+                _, old_value = self._data.pop(old_key)
+                self._evict(old_key, old_value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def pin(self, key) -> None:
+        """Impide que `key` se expulse (por LRU o TTL) hasta el unpin() correspondiente."""
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key) -> None:
+        with self._lock:
+            count = self._pinned.pop(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+
+    def values(self) -> list:
+        """Copia de los valores vivos sin renovar su TTL."""
+        with self._lock:
+            self._expire()
+            return [value for _, value in self._data.values()]
+
+    def _expire(self) -> None:
+        # El orden es de último acceso, así que las caducadas están al principio
+        now = time.monotonic()
+        for key, (expires, value) in list(self._data.items()):
+            if expires > now:
+                break
+            if key in self._pinned:
+                # en uso: se renueva en lugar de expulsarla
+                self._data[key] = (now + self.ttl, value)
+                self._data.move_to_end(key)
+                continue
+            del self._data[key]
+            self._evict(key, value)
+
+    def _evict(self, key, value) -> None:
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(key, value)
+        except Exception:  # noqa: BLE001 - la expulsión nunca debe romper la petición
+            pass
+
+
+session_store: SessionCache = SessionCache(SESSION_MAXSIZE, SESSION_TTL)
+
+# Los CSV de sesión se guardan en la raíz del repo (padre de backend/)
+_CSV_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_UNSAFE_SID_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def _session_csv_path(session_id: str) -> str:
+    """Ruta del CSV de una sesión; el id se sanea para que no pueda salir de _CSV_DIR."""
+    return os.path.join(_CSV_DIR, f"datos_pendulo_{_UNSAFE_SID_CHARS.sub('_', str(session_id))}.csv")
+
+
+class SegmentWriter:
+    """
+    CSV de sesión escrito por segmentos: cada fila se formatea a bytes en un
+    buffer en memoria y el buffer se vuelca con un único os.write() cuando
+    llega a SEGMENT_SIZE o al llamar a flush(). Evita las capas de
+    TextIOWrapper/csv.writer y el write()+flush() por frame.
+    Con append=True se sigue al final de un CSV existente (sin repetir cabecera).
+    """
+
+    SEGMENT_SIZE = 64 * 1024
+    _FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | getattr(os, "O_BINARY", 0)
+
+    def __init__(self, path: str, header, append: bool = False):
+        self.path = path
+        flags = self._FLAGS & ~os.O_TRUNC if append else self._FLAGS
+        self._fd: Optional[int] = os.open(path, flags, 0o644)
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        if os.fstat(self._fd).st_size == 0:
+            self.writerow(header)
+
+    @property
+    def closed(self) -> bool:
+        return self._fd is None
+
+    def writerow(self, row) -> None:
+        line = (",".join(map(str, row)) + "\r\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                # cerrado: la fila no llegaría nunca a disco y el buffer crecería sin límite
+                raise ValueError(f"escritura en un CSV cerrado: {self.path}")
+            self._buf += line
+            if len(self._buf) >= self.SEGMENT_SIZE:
+                self._write_segment()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_segment()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is None:
+                return
+            self._write_segment()
+            os.close(self._fd)
+            self._fd = None
+
+    def _write_segment(self) -> None:
+        if self._fd is None or not self._buf:
+            return
+        view = memoryview(self._buf)
+        written = 0
+        while written < len(view):
+            written += os.write(self._fd, view[written:])
+        view.release()
+        self._buf.clear()
+
+
+session_csv_writers: SessionCache = SessionCache(
+    SESSION_MAXSIZE, SESSION_TTL, on_evict=lambda _sid, csv_writer: csv_writer.close()
+)
+
+CSV_FLUSH_INTERVAL = 1.0  # s entre volcados de las filas pendientes a disco
+
+
+def _csv_flush_loop() -> None:
+    """Hilo de fondo: un único volcado por segundo para todas las sesiones."""
+    while True:
+        time.sleep(CSV_FLUSH_INTERVAL)
+        for csv_writer in session_csv_writers.values():
+            try:
+                csv_writer.flush()
+            except Exception:  # noqa: BLE001 - no tumbar el hilo por un fichero
+                pass
+
+
+threading.Thread(target=_csv_flush_loop, name="csv-flush", daemon=True).start()
+
+
+# Cabeceras CORS constantes: se calculan una vez y se aplican con un update()
+_CORS_STATIC = {
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Vary": "Origin",
+}
+_CORS_NO_ORIGIN = {
+    **_CORS_STATIC,
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+_CORS_PREFLIGHT_EXTRA = {"Access-Control-Max-Age": "3600"}
+
+
+def _apply_cors(response):
+    """Aplica CORS; solo Origin y Allow-Headers dependen de la petición."""
+    origin = request.headers.get("Origin")
+    if not origin:  # sin cabecera o vacía: "*", como antes con `or "*"`
+        response.headers.update(_CORS_NO_ORIGIN)
+        return response
+    response.headers.update(_CORS_STATIC)
+    response.headers["Access-Control-Allow-Origin"] = origin
+    response.headers["Access-Control-Allow-Headers"] = request.headers.get(
+        "Access-Control-Request-Headers", "Content-Type"
+    )
+    return response
 
 
 @app.before_request
 def handle_preflight():
     """
     Responde rápido a los preflight OPTIONS para que el navegador permita la petición real.
+    El resto de cabeceras CORS las añade add_cors_headers (after_request).
     """
     if request.method == "OPTIONS":
         response = app.make_default_options_response()
-        origin = request.headers.get("Origin") or "*"
-        response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Vary"] = "Origin"
-        response.headers["Access-Control-Allow-Headers"] = request.headers.get(
-            "Access-Control-Request-Headers", "Content-Type"
-        )
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response.headers["Access-Control-Max-Age"] = "3600"
+        response.headers.update(_CORS_PREFLIGHT_EXTRA)
         return response
 
 
 @app.after_request
 def add_cors_headers(response):
     """Permitir CORS simple para los endpoints HTTP."""
-    origin = request.headers.get("Origin") or "*"
-    response.headers["Access-Control-Allow-Origin"] = origin
-    response.headers["Vary"] = "Origin"
-    response.headers["Access-Control-Allow-Headers"] = request.headers.get(
-        "Access-Control-Request-Headers", "Content-Type"
-    )
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-    return response
+    return _apply_cors(response)
+
+
+STREAM_QUEUE_SIZE = 2  # frames pendientes por conexión; si el cliente va más rápido se descartan los viejos
+
+
+def _put_latest(pending: "queue.Queue", data) -> None:
+    """Encola sin bloquear; si la cola está llena descarta el frame más antiguo."""
+    try:
+        pending.put_nowait(data)
+    except queue.Full:
+        try:
+            pending.get_nowait()
+        except queue.Empty:
+            pass
+        # solo hay un productor: tras sacar uno siempre queda hueco
+        pending.put_nowait(data)
+
+
+@contextmanager
+def _corked(sock):
+    """
+    Activa TCP_CORK (Linux) mientras dura el bloque para que varios ws.send()
+    salgan en los mismos segmentos TCP. En otras plataformas no hace nada.
+    """
+    cork = getattr(socket, "TCP_CORK", None)
+    corked = False
+    if sock is not None and cork is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, cork, 1)
+            corked = True
+        except OSError:
+            pass
+    try:
+        yield
+    finally:
+        if corked:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, cork, 0)
+            except OSError:
+                pass
+
+
+def _handle_stream_message(data, processor: PendulumProcessor, touched_sessions: set) -> Union[str, bytes]:
+    """Procesa un mensaje de /stream y devuelve la respuesta que hay que enviar."""
+    is_json_input = is_json_message(data)
+
+    try:
+        frame, fps_override, timestamp, session_id = decode_ws_message(data)
+    except Exception as exc:  # noqa: BLE001 - devolver error al cliente
+        return json_bytes({"error": str(exc)}).decode("utf-8")
+
+    if fps_override:
+        processor.fps = fps_override
+
+    target_proc = processor
+    if session_id:
+        if session_id not in touched_sessions:
+            # mientras la conexión siga abierta la sesión no se expulsa: se perdería
+            # su estado y el CSV se cerraría entre dos frames
+            session_store.pin(session_id)
+            session_csv_writers.pin(session_id)
+        target_proc = session_store.setdefault(session_id, PendulumProcessor(fps=processor.fps))
+        touched_sessions.add(session_id)
+
+    processed, info = target_proc.process_frame(frame, timestamp=timestamp)
+
+    if session_id:
+        csv_writer = session_csv_writers.get(session_id)
+        if csv_writer is None or csv_writer.closed:
+            # el writer de una conexión anterior de la misma sesión se cerró al
+            # desconectar: se abre uno nuevo que sigue al final de su CSV
+            csv_writer = SegmentWriter(
+                _session_csv_path(session_id),
+                ["frame", "tiempo_s", "x", "y", "radio"],
+                append=csv_writer is not None,
+            )
+            session_csv_writers[session_id] = csv_writer
+        if info["x"] is not None:
+            csv_writer.writerow(target_proc.last_record())
+
+    if is_json_input:
+        return encode_ws_message(processed, {"info": info, "session_id": session_id})
+    return frame_to_jpeg_bytes(processed)
+
+
+def _stream_worker(ws, pending: "queue.Queue", processor: PendulumProcessor, touched_sessions: set) -> None:
+    """
+    Hilo de procesamiento de una conexión /stream: toma todo lo que haya en la
+    cola, lo procesa y envía las respuestas juntas. Termina al sacar None.
+    """
+    try:
+        running = True
+        while running:
+            batch = [pending.get()]
+            while True:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [data for data in batch if data is not None]
+
+            outgoing = [_handle_stream_message(data, processor, touched_sessions) for data in batch]
+            with _corked(getattr(ws, "sock", None)):
+                for message in outgoing:
+                    ws.send(message)
+    except Exception:  # noqa: BLE001 - cerrar el socket para que stream() salga de receive()
+        try:
+            ws.close()
+        except Exception:
+            pass
 
 
 @sock.route("/stream")
@@ -65,71 +389,49 @@ def stream(ws):
       - Texto base64
       - Binario (JPEG/PNG comprimido)
       - JSON: {"frame": "<b64>", "fps": 30, "timestamp": 0.033, "session_id": "..."}
-    Respuesta:
-      - Si la entrada fue JSON -> JSON {"frame": "<b64>", "info": {...}}
-      - Si fue base64/binario simple -> solo el frame en base64
+    Respuesta (siempre binaria, sin base64):
+      - Si la entrada fue JSON -> <uint32 LE len> + JSON {"info": {...}, "session_id": ...} + JPEG
+      - Si fue base64/binario simple -> solo el JPEG
+    La recepción y el procesamiento van en hilos distintos unidos por una cola de
+    STREAM_QUEUE_SIZE frames. Si el cliente envía más rápido de lo que se procesa
+    se descartan los frames más antiguos (esos frames tampoco llegan al CSV).
     """
     processor = PendulumProcessor()
     touched_sessions = set()
+    pending: "queue.Queue" = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    worker = threading.Thread(
+        target=_stream_worker,
+        args=(ws, pending, processor, touched_sessions),
+        name="stream-worker",
+        daemon=True,
+    )
+    worker.start()
 
-    while True:
-        data = ws.receive()
-        if data is None:
-            break
-
-        is_json_input = isinstance(data, str) and data.lstrip().startswith("{")
-
-        try:
-            frame, fps_override, timestamp = decode_ws_message(data)
-            session_id = None
-            if isinstance(data, str) and data.lstrip().startswith("{"):
-                payload = json.loads(data)
-                session_id = payload.get("session_id")
-        except Exception as exc:  # noqa: BLE001 - devolver error al cliente
-            ws.send(json.dumps({"error": str(exc)}))
-            continue
-
-        if fps_override:
-            processor.fps = fps_override
-
-        target_proc = processor
-        if session_id:
-            target_proc = session_store.setdefault(session_id, PendulumProcessor(fps=processor.fps))
-            touched_sessions.add(session_id)
-
-        processed, info = target_proc.process_frame(frame, timestamp=timestamp)
-
-        if session_id:
-            csv_info = session_csv_writers.get(session_id)
-            if csv_info is None:
-                csv_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
-                f_handle = open(csv_path, "w", newline="")
-                writer = csv.writer(f_handle)
-                writer.writerow(["frame", "tiempo_s", "x", "y", "radio"])
-                csv_info = (csv_path, f_handle, writer)
-                session_csv_writers[session_id] = csv_info
-            csv_path, f_handle, writer = csv_info
-            if target_proc.records:
-                last_row = target_proc.records[-1]
-                if len(last_row) >= 5:
-                    writer.writerow(last_row)
-                    f_handle.flush()
-
-        if is_json_input:
-            ws.send(json.dumps({"frame": frame_to_b64(processed), "info": info, "session_id": session_id}))
-        else:
-            ws.send(frame_to_b64(processed))
-
-    # cerrar csvs usados en esta conexión
-    for sid in touched_sessions:
-        csv_info = session_csv_writers.get(sid)
-        if csv_info:
-            _, f_handle, _ = csv_info
-            try:
-                f_handle.flush()
-                f_handle.close()
-            except Exception:
-                pass
+    try:
+        while True:
+            data = ws.receive()
+            if data is None:
+                break
+            _put_latest(pending, data)
+    finally:
+        _put_latest(pending, None)
+        worker.join()
+        # el recuento de oscilaciones va por lotes: incorporar el último lote parcial
+        processor.recount_oscillations()
+        for sid in touched_sessions:
+            session_proc = session_store.get(sid)
+            if session_proc is not None:
+                session_proc.recount_oscillations()
+        # cerrar csvs usados en esta conexión, también si se cortó por una excepción
+        for sid in touched_sessions:
+            csv_writer = session_csv_writers.get(sid)
+            if csv_writer:
+                try:
+                    csv_writer.close()
+                except Exception:
+                    pass
+            session_csv_writers.unpin(sid)
+            session_store.unpin(sid)
 
 
 # -------------------------------------------------------------------
@@ -140,26 +442,85 @@ DEFAULT_SERIAL_PORT = "/dev/ttyUSB0"
 SERVO_COMMAND = "OPENSIGNAL\n"
 
 
+SERIAL_BOOT_WAIT = 2.5  # s; muchos Arduinos (sobre todo clones CH340) se reinician al abrir el puerto
+SERIAL_OPEN_TIMEOUT = 10.0
+
+
+class SerialWriter:
+    """
+    Mantiene un puerto serie abierto en un hilo propio y escribe todo lo que
+    llega a su cola. La apertura (y la espera al arranque del Arduino) se
+    paga una sola vez; después cada envío es encolar y volver.
+    """
+
+    def __init__(self, port: str, baudrate: int):
+        self.port = port
+        self.baudrate = baudrate
+        self.error: Optional[str] = None
+        self._queue: "queue.Queue[bytes]" = queue.Queue()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"serial-{port}", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def send(self, message: str) -> None:
+        self._queue.put(message.encode("ascii"))
+
+    def _run(self) -> None:
+        try:
+            with serial.Serial(self.port, baudrate=self.baudrate, timeout=2) as ser:
+                time.sleep(SERIAL_BOOT_WAIT)
+                if hasattr(ser, "reset_input_buffer"):
+                    ser.reset_input_buffer()
+                self._ready.set()
+                while True:
+                    ser.write(self._queue.get())
+                    ser.flush()
+        except Exception as exc:  # noqa: BLE001 - se reporta en la siguiente petición
+            self.error = str(exc)
+        finally:
+            self._ready.set()
+
+
+_serial_writers: Dict[Tuple[str, int], SerialWriter] = {}
+_serial_lock = threading.Lock()
+
+
 def _write_serial_command(port: str, message: str, baudrate: int = 9600) -> Tuple[bool, Optional[str]]:
     """
     Envía un mensaje ASCII a un puerto serie y devuelve (ok, error_str).
-    No mantiene la conexión abierta: abre, escribe, cierra.
+    La conexión queda abierta en un SerialWriter por (puerto, baudrate): solo la
+    primera petición espera a que arranque el Arduino. Si el hilo murió (puerto
+    desconectado o no se pudo abrir), se reporta su error y se vuelve a abrir en la siguiente.
     """
     if serial is None:
         return False, "pyserial no está instalado o hay un paquete 'serial' conflictivo."
 
-    try:
-        with serial.Serial(port, baudrate=baudrate, timeout=2) as ser:
-            # Muchos Arduinos (sobre todo clones CH340) se reinician al abrir el puerto;
-            # esperamos un poco a que termine el boot.
-            time.sleep(2.5)
-            if hasattr(ser, "reset_input_buffer"):
-                ser.reset_input_buffer()
-            ser.write(message.encode("ascii"))
-            ser.flush()
-            return True, None
-    except Exception as exc:  # noqa: BLE001 - reportar error al cliente
-        return False, str(exc)
+    key = (port, baudrate)
+    with _serial_lock:
+        writer = _serial_writers.get(key)
+        if writer is not None and writer.error is not None:
+            del _serial_writers[key]
+            return False, writer.error or "El puerto serie se cerró"
+        if writer is None:
+            writer = SerialWriter(port, baudrate)
+            _serial_writers[key] = writer
+
+    if not writer.wait_ready(SERIAL_OPEN_TIMEOUT):
+        return False, f"Tiempo de espera agotado abriendo {port}"
+    if writer.error is not None:
+        with _serial_lock:
+            if _serial_writers.get(key) is writer:
+                del _serial_writers[key]
+        return False, writer.error or "El puerto serie se cerró"
+
+    writer.send(message)
+    return True, None
+
+
+_SERVO_BASE = {"type": "servo_status", "command": "servo", "serial_message": SERVO_COMMAND}
 
 
 def handle_servo_command(port: str, baudrate: int = 9600) -> Dict:
@@ -174,11 +535,9 @@ def handle_servo_command(port: str, baudrate: int = 9600) -> Dict:
         message = f"No se pudo escribir en {port}: {error}"
 
     return {
-        "type": "servo_status",
-        "command": "servo",
+        **_SERVO_BASE,
         "target_port": port,
         "baudrate": baudrate,
-        "serial_message": SERVO_COMMAND,
         "write_ok": ok,
         "write_error": error,
         "message": message,
@@ -198,13 +557,49 @@ def servo_http():
     baudrate = request.args.get("baudrate", type=int) or 9600
 
     result = handle_servo_command(port, baudrate)
-    return jsonify(result)
+    return app.response_class(json_bytes(result), mimetype="application/json")
 
 
 # -------------------------------------------------------------------
 # ANÁLISIS (matplotlib desde stream)
 # -------------------------------------------------------------------
 
+# Los kernels de Numba se compilan al arrancar cada worker, fuera del hilo de
+# la primera petición de /analysis (si llega antes, espera a que termine)
+threading.Thread(target=warm_up_kernels, name="numba-warmup", daemon=True).start()
+
+PLOT_CACHE_SIZE = 32  # salidas de build_plot_and_stats recordadas (LRU)
+_plot_cache: "OrderedDict[Hashable, Dict]" = OrderedDict()
+_plot_cache_lock = threading.Lock()
+
+
+def _samples_key(times, xs, ys, *extra) -> Tuple:
+    """Clave de caché a partir del contenido de las muestras (y pivotes, etc.)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (times, xs, ys):
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return (digest.digest(),) + extra
+
+
+def _cached_plot_and_stats(key: Hashable, build: Callable[[], Dict]) -> Dict:
+    """
+    Devuelve la salida de build_plot_and_stats para `key`, generándola solo si
+    no está en caché. La gráfica PNG es lo caro; en un acierto no se toca matplotlib.
+    """
+    with _plot_cache_lock:
+        output = _plot_cache.get(key)
+        if output is not None:
+            _plot_cache.move_to_end(key)
+            return dict(output)
+
+    output = build()
+    with _plot_cache_lock:
+        _plot_cache[key] = output
+        _plot_cache.move_to_end(key)
+        while len(_plot_cache) > PLOT_CACHE_SIZE:
+            _plot_cache.popitem(last=False)
+    return dict(output)
+
 
 @app.route("/analysis/plot", methods=["POST"])
 def analysis_plot():
@@ -234,29 +629,34 @@ def analysis_plot():
         return jsonify({"error": "Se requieren al menos 2 muestras y longitudes iguales"}), 400
 
     try:
-        times_f = [float(t) for t in times]
-        xs_f = [float(x) for x in xs]
-        ys_f = [float(y) for y in ys]
+        times_f = np.asarray(times, dtype=np.float64)
+        xs_f = np.asarray(xs, dtype=np.float64)
+        ys_f = np.asarray(ys, dtype=np.float64)
+        # np.asarray convierte None en NaN en vez de fallar como float(None)
+        if not (np.isfinite(times_f).all() and np.isfinite(xs_f).all() and np.isfinite(ys_f).all()):
+            raise ValueError("valores no numéricos")
         pivot_x_f = float(pivot_x) if pivot_x is not None else None
         pivot_y_f = float(pivot_y) if pivot_y is not None else None
     except Exception:
         return jsonify({"error": "No se pudieron convertir los datos a float"}), 400
 
-    output = build_plot_and_stats(times_f, xs_f, ys_f, pivot_x=pivot_x_f, pivot_y=pivot_y_f)
+    output = _cached_plot_and_stats(
+        _samples_key(times_f, xs_f, ys_f, pivot_x_f, pivot_y_f),
+        lambda: build_plot_and_stats(times_f, xs_f, ys_f, pivot_x=pivot_x_f, pivot_y=pivot_y_f),
+    )
     if session_id and session_id in session_store:
         processor = session_store[session_id]
-        csv_info = session_csv_writers.get(session_id)
-        if csv_info:
-            csv_path, f_handle, _ = csv_info
+        csv_writer = session_csv_writers.get(session_id)
+        if csv_writer:
             try:
-                f_handle.flush()
+                csv_writer.flush()
             except Exception:
                 pass
-            output["csv_path"] = str(csv_path)
+            output["csv_path"] = str(csv_writer.path)
         elif processor.has_data:
-            export_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
-            processor.export_csv(str(export_path))
-            output["csv_path"] = str(export_path)
+            export_path = _session_csv_path(session_id)
+            processor.export_csv(export_path)
+            output["csv_path"] = export_path
     if not output.get("plot"):
         return jsonify({"error": "No se pudo generar la gráfica"}), 400
     return jsonify(output)
@@ -277,9 +677,9 @@ def analysis_export_csv():
     if not processor or not processor.has_data:
         return jsonify({"error": "No hay datos para esa sesión"}), 404
 
-    export_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
-    processor.export_csv(str(export_path))
-    return jsonify({"ok": True, "path": str(export_path)})
+    export_path = _session_csv_path(session_id)
+    processor.export_csv(export_path)
+    return jsonify({"ok": True, "path": export_path})
 
 
 @app.route("/analysis/finalize_csv", methods=["POST"])
@@ -292,20 +692,19 @@ def analysis_finalize_csv():
     if not session_id:
         return jsonify({"error": "session_id es requerido"}), 400
 
-    csv_info = session_csv_writers.get(session_id)
-    if csv_info:
-        csv_path, f_handle, _ = csv_info
+    csv_writer = session_csv_writers.get(session_id)
+    if csv_writer:
         try:
-            f_handle.flush()
+            csv_writer.flush()
         except Exception:
             pass
-        return jsonify({"ok": True, "path": str(csv_path)})
+        return jsonify({"ok": True, "path": str(csv_writer.path)})
 
     processor = session_store.get(session_id)
     if processor and processor.has_data:
-        export_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
-        processor.export_csv(str(export_path))
-        return jsonify({"ok": True, "path": str(export_path)})
+        export_path = _session_csv_path(session_id)
+        processor.export_csv(export_path)
+        return jsonify({"ok": True, "path": export_path})
 
     return jsonify({"error": "No hay datos para esa sesión"}), 404
 
@@ -324,30 +723,24 @@ def analysis_plot_csv():
     if path:
         csv_path = Path(path)
     elif session_id:
-        csv_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
+        csv_path = Path(_session_csv_path(session_id))
 
     if not csv_path or not csv_path.exists():
         return jsonify({"error": "CSV no encontrado"}), 404
 
-    times: list[float] = []
-    xs: list[float] = []
-    ys: list[float] = []
+    # Si el fichero no cambió (mtime + tamaño) no hace falta ni leerlo
+    stat = csv_path.stat()
+    cache_key = ("csv", str(csv_path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+    def build() -> Dict:
+        # columnas: frame, tiempo_s, x, y, radio
+        data = np.loadtxt(csv_path, delimiter=",", skiprows=1, usecols=(1, 2, 3), ndmin=2)
+        return build_plot_and_stats(data[:, 0], data[:, 1], data[:, 2])
 
     try:
-        with open(csv_path, newline="") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 5:
-                    continue
-                _, t, x, y, _ = row
-                times.append(float(t))
-                xs.append(float(x))
-                ys.append(float(y))
+        output = _cached_plot_and_stats(cache_key, build)
     except Exception as exc:  # noqa: BLE001
         return jsonify({"error": f"No se pudo leer el CSV: {exc}"}), 400
-
-    output = build_plot_and_stats(times, xs, ys)
     output["csv_path"] = str(csv_path)
     if not output.get("plot"):
         return jsonify({"error": "No se pudo generar la gráfica"}), 400
@@ -402,28 +795,31 @@ def analysis_session_summary():
     pivot_x = processor.center_x if processor.center_x is not None else processor.default_pivot_x
     pivot_y = processor.line_y if processor.line_y is not None else processor.default_pivot_y
 
-    output = build_plot_and_stats(
-        list(processor.time_series),
-        list(processor.x_series),
-        list(processor.y_series),
-        pivot_x=pivot_x,
-        pivot_y=pivot_y,
-        fallback_px=pivot_x,
-        fallback_py=pivot_y,
+    times, xs, ys = processor.series()
+    output = _cached_plot_and_stats(
+        _samples_key(times, xs, ys, pivot_x, pivot_y),
+        lambda: build_plot_and_stats(
+            times,
+            xs,
+            ys,
+            pivot_x=pivot_x,
+            pivot_y=pivot_y,
+            fallback_px=pivot_x,
+            fallback_py=pivot_y,
+        ),
     )
 
-    csv_info = session_csv_writers.get(session_id)
-    if csv_info:
-        csv_path, f_handle, _ = csv_info
+    csv_writer = session_csv_writers.get(session_id)
+    if csv_writer:
         try:
-            f_handle.flush()
+            csv_writer.flush()
         except Exception:
             pass
-        output["csv_path"] = str(csv_path)
+        output["csv_path"] = str(csv_writer.path)
     elif processor.has_data:
-        export_path = Path(app.root_path).parent / f"datos_pendulo_{session_id}.csv"
-        processor.export_csv(str(export_path))
-        output["csv_path"] = str(export_path)
+        export_path = _session_csv_path(session_id)
+        processor.export_csv(export_path)
+        output["csv_path"] = export_path
 
     output["session_id"] = session_id
     output["summary_lines"] = _summary_lines(output.get("stats"))
@@ -467,11 +863,16 @@ def build_ssl_context() -> Union[None, Tuple[str, str]]:
 
 
 if __name__ == "__main__":
-    # IMPORTANTE: esto va al final, después de definir todas las rutas
+    # IMPORTANTE: esto va al final, después de definir todas las rutas.
+    # Servidor de desarrollo de Werkzeug; en producción usar gunicorn con wsgi.py.
     host = os.getenv("BACKEND_HOST", "0.0.0.0")
     port = int(os.getenv("BACKEND_PORT", "5000"))
     ssl_context = build_ssl_context()
 
+    debug = os.getenv("DEV", "0") == "1"
+
     scheme = "https" if ssl_context else "http"
-    print(f"Iniciando backend en {scheme}://{host}:{port}")
-    app.run(host=host, port=port, debug=True, ssl_context=ssl_context)
+    print(f"Iniciando backend en {scheme}://{host}:{port} (debug={debug})")
+    if not debug:
+        print("Servidor de desarrollo: para producción usa run_secure.sh (gunicorn + wsgi.py)")
+    app.run(host=host, port=port, debug=debug, threaded=True, ssl_context=ssl_context)
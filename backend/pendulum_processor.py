@@ -1,29 +1,142 @@
 import base64
-import csv
 import json
 import io
+import os
+import struct
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 import cv2
 import numpy as np
-from scipy.signal import savgol_filter
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from scipy.signal import savgol_coeffs
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from dataclasses import asdict
 
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
+
+try:
+    import msgspec  # type: ignore
+except Exception:
+    msgspec = None
+
+try:
+    import numba  # type: ignore
+except Exception:
+    numba = None
+
+try:
+    from turbojpeg import TJPF_BGR, TJSAMP_420, TurboJPEG  # type: ignore  # libjpeg-turbo (SIMD)
+
+    _turbojpeg = TurboJPEG()
+except Exception:  # paquete o libturbojpeg no instalados
+    _turbojpeg = None
+
+try:
+    import pybase64 as b64codec  # type: ignore  # base64 con SIMD (SSSE3/AVX2)
+except Exception:
+    b64codec = base64
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+if msgspec is not None:
+
+    class WsFrameMessage(msgspec.Struct):
+        """Mensaje JSON de /stream decodificado directamente a un struct tipado."""
+
+        frame: str = ""
+        fps: Optional[float] = None
+        timestamp: Optional[float] = None
+        session_id: Optional[str] = None
+
+    # strict=False acepta números enviados como texto ("30"), igual que float(...)
+    _ws_decoder = msgspec.json.Decoder(WsFrameMessage, strict=False)
+else:
+    _ws_decoder = None
+
+
+def json_bytes(obj) -> bytes:
+    """Serializa a JSON UTF-8 (orjson si está instalado, si no json estándar)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj).encode("utf-8")
+
+
 # ------------ CONFIGURACIÓN PARA BOLA NARANJA SOBRE FONDO NEGRO ------------
 ORANGE_LOWER = np.array([5, 140, 80], dtype=np.uint8)  # H, S, V
 ORANGE_UPPER = np.array([30, 255, 255], dtype=np.uint8)
+# mismos límites como escalares para cv2.cuda.inRange (se crean una sola vez)
+_ORANGE_LOWER_SCALAR = tuple(ORANGE_LOWER.tolist())
+_ORANGE_UPPER_SCALAR = tuple(ORANGE_UPPER.tolist())
+
+# Vértices rojos: el rojo da la vuelta en H (0-10 y 170-180). Rotando H en +10
+# (mód. 180) con una LUT ambos tramos quedan en 0-20 y basta un solo inRange.
+RED_HUE_SHIFT = 10
+RED_LOWER = np.array([0, 100, 80], dtype=np.uint8)
+RED_UPPER = np.array([10 + RED_HUE_SHIFT, 255, 255], dtype=np.uint8)
+_RED_HUE_LUT = np.empty((256, 1, 3), dtype=np.uint8)
+_RED_HUE_LUT[:, 0, 0] = (np.arange(256) + RED_HUE_SHIFT) % 180  # H de OpenCV va de 0 a 179
+_RED_HUE_LUT[:, 0, 1] = np.arange(256)
+_RED_HUE_LUT[:, 0, 2] = np.arange(256)
 
 MIN_CONTOUR_AREA = 100  # área mínima de la bola
+MIN_VERTEX_AREA = 10  # área mínima de cada vértice rojo
 DEAD_ZONE = 5  # px alrededor del centro que se consideran "centro"
+OSCILLATION_RECOUNT_EVERY = 10  # muestras entre recuentos (vectorizados) de oscilaciones
 
 # Suavizado del centro (0 = no usa valor previo, 1 = no cambia nunca)
 CENTER_ALPHA = 0.8  # cuanto más alto, más suave/estable el centro
 # ----------------------------------------------------------------------------
 
+# Factor de reducción de las ROI antes de HSV/máscaras/morfología (1 = resolución
+# completa, por defecto). Con 2 se procesan 4 veces menos píxeles, pero en frames
+# con desenfoque de movimiento la máscara se parte distinto y la bola o los
+# vértices pueden salir decenas de px desplazados (mediana 1 px en pendulo8.mp4,
+# máximo 90 px): solo para cuando importa más la velocidad que la precisión.
+# Las coordenadas se vuelven a escalar al frame original.
+DETECT_DOWNSCALE = max(1, int(os.getenv("DETECT_DOWNSCALE", "1")))
+
+# OpenCL (T-API, cv2.UMat) para cvtColor/inRange/morfología: "0" nunca, "1" siempre
+# que haya dispositivo, "auto" mide una vez ambos caminos y se queda con el más rápido.
+USE_OPENCL = os.getenv("USE_OPENCL", "auto").lower()
+
+# CUDA (solo builds de OpenCV con CUDA) para cvtColor+inRange de la bola: "1" lo
+# activa si hay GPU. La morfología sigue en CPU: la de cv2.cuda suele ser más lenta.
+USE_CUDA = os.getenv("USE_CUDA", "0") == "1"
+
+# Calidad JPEG de los frames devueltos por /stream (cv2 usa 95 por defecto).
+# 78 recorta bastante el coste de codificación y el tamaño sin pérdida visible.
+STREAM_JPEG_QUALITY = int(os.getenv("STREAM_JPEG_Q", "78"))
+
+# Figura reutilizada entre peticiones (Agg directo, sin pyplot). Crear la figura,
+# los ejes y la caché de fuentes en cada llamada domina el coste de la gráfica.
+_PLOT_FIG = Figure(figsize=(6, 8))
+_PLOT_CANVAS = FigureCanvasAgg(_PLOT_FIG)
+_PLOT_AX = _PLOT_FIG.add_subplot(111)
+_PLOT_LOCK = threading.Lock()  # Flask puede atender peticiones en paralelo
+
+
+@lru_cache(maxsize=None)
+def _savgol_kernels(window: int, polyorder: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Coeficientes Savitzky-Golay para (ventana, orden), calculados una sola vez.
+    Devuelve el filtro FIR del interior y las matrices que reproducen el ajuste
+    polinómico de los bordes (mode="interp" de scipy).
+    """
+    coeffs = savgol_coeffs(window, polyorder)
+    half = window // 2
+    x = np.arange(window, dtype=np.float64)
+    fit = np.linalg.pinv(np.vander(x, polyorder + 1))
+    head = np.vander(x[:half], polyorder + 1) @ fit
+    tail = np.vander(x[window - half:], polyorder + 1) @ fit
+    return coeffs, head, tail
+
 
 def _savgol_or_original(values, polyorder=3):
     """Devuelve la señal suavizada si hay suficientes datos para Savitzky-Golay."""
@@ -38,29 +151,95 @@ def _savgol_or_original(values, polyorder=3):
     if window < polyorder + 2:
         return np.array(values)
 
-    return savgol_filter(values, window_length=window, polyorder=polyorder)
+    arr = np.asarray(values, dtype=np.float64)
+    coeffs, head, tail = _savgol_kernels(window, polyorder)
+    half = window // 2
+    out = np.empty_like(arr)
+    out[half:count - half] = np.convolve(arr, coeffs, mode="valid")
+    out[:half] = head @ arr[:window]
+    out[count - half:] = tail @ arr[count - window:]
+    return out
+
+
+def _upscale(value: float) -> float:
+    """Pasa una coordenada de la imagen reducida al frame original (centros de píxel)."""
+    return (value + 0.5) * DETECT_DOWNSCALE - 0.5
+
+
+def _mask_pipeline_benchmark(img, kernel) -> np.ndarray:
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, ORANGE_LOWER, ORANGE_UPPER)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    return mask.get() if isinstance(mask, cv2.UMat) else mask
+
+
+@lru_cache(maxsize=None)
+def _opencl_enabled() -> bool:
+    """Decide (una sola vez por proceso) si las máscaras se calculan con cv2.UMat."""
+    if USE_OPENCL in ("0", "false", "no") or not cv2.ocl.haveOpenCL():
+        cv2.ocl.setUseOpenCL(False)
+        return False
+    cv2.ocl.setUseOpenCL(True)
+    if USE_OPENCL != "auto":
+        return True
+
+    # En GPUs integradas y drivers viejos UMat puede ir más lento que la CPU: se mide.
+    sample = np.random.default_rng(0).integers(0, 256, (360, 640, 3), dtype=np.uint8)
+    kernel = np.ones((3, 3), np.uint8)
+    timings = {}
+    for use_umat in (False, True):
+        img = cv2.UMat(sample) if use_umat else sample
+        _mask_pipeline_benchmark(img, kernel)  # calentamiento (compila kernels OpenCL)
+        start = time.perf_counter()
+        for _ in range(5):
+            _mask_pipeline_benchmark(img, kernel)
+        timings[use_umat] = time.perf_counter() - start
+
+    enabled = timings[True] < timings[False]
+    cv2.ocl.setUseOpenCL(enabled)
+    return enabled
+
+
+@lru_cache(maxsize=None)
+def _cuda_enabled() -> bool:
+    """True si USE_CUDA=1 y OpenCV ve una GPU CUDA (no en Jetson, donde no compensa)."""
+    if not USE_CUDA or os.path.exists("/etc/nv_tegra_release"):
+        return False
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except Exception:
+        return False
+
+
+def _to_device(img: np.ndarray):
+    """Sube la imagen a un cv2.UMat si OpenCL está activo; si no, la deja igual."""
+    return cv2.UMat(img) if _opencl_enabled() else img
+
+
+def _to_host(img) -> np.ndarray:
+    return img.get() if isinstance(img, cv2.UMat) else img
 
 
 def _zero_crossings(times, signal):
     """Devuelve los instantes donde la señal cruza por cero."""
-    crossings = []
-    for i in range(len(signal) - 1):
-        y1 = signal[i]
-        y2 = signal[i + 1]
-        if y1 == 0 and y2 == 0:
-            continue
-        if y1 == 0:
-            crossings.append(float(times[i]))
-            continue
-        if y2 == 0:
-            crossings.append(float(times[i + 1]))
-            continue
-        if y1 * y2 < 0:
-            frac = -y1 / (y2 - y1)
-            if 0 <= frac <= 1:
-                t_cross = times[i] + frac * (times[i + 1] - times[i])
-                crossings.append(float(t_cross))
-    return crossings
+    t = np.asarray(times, dtype=np.float64)
+    y = np.asarray(signal, dtype=np.float64)
+    if y.size < 2:
+        return []
+
+    y1 = y[:-1]
+    y2 = y[1:]
+    z1 = y1 == 0
+    z2 = y2 == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = -y1 / (y2 - y1)
+    sign_change = (y1 * y2 < 0) & (frac >= 0) & (frac <= 1)
+
+    # como mucho un cruce por intervalo: muestra exacta en cero o interpolación lineal
+    t_cross = np.where(z1, t[:-1], np.where(z2, t[1:], t[:-1] + frac * np.diff(t)))
+    mask = (z1 != z2) | sign_change
+    return t_cross[mask].tolist()
 
 
 @dataclass
@@ -79,6 +258,118 @@ class PendulumStats:
     pivot_y: float
 
 
+def _gradient_loop(f, x, out):
+    """np.gradient(f, x) (orden 2 en el interior, orden 1 en los bordes) en un solo bucle."""
+    n = f.shape[0]
+    out[0] = (f[1] - f[0]) / (x[1] - x[0])
+    for i in range(1, n - 1):
+        h1 = x[i] - x[i - 1]
+        h2 = x[i + 1] - x[i]
+        out[i] = (
+            -h2 / (h1 * (h1 + h2)) * f[i - 1]
+            + (h2 - h1) / (h1 * h2) * f[i]
+            + h1 / (h2 * (h1 + h2)) * f[i + 1]
+        )
+    out[n - 1] = (f[n - 1] - f[n - 2]) / (x[n - 1] - x[n - 2])
+
+
+def _gradient_numpy(f, x, out):
+    """Mismo contrato que _gradient_loop con np.gradient (sin Numba)."""
+    out[:] = np.gradient(f, x)
+
+
+def _stats_loop(arr_t, arr_x, arr_y, px, py):
+    """
+    Ángulo, media, |θ| máx, longitud media y máximos de |θ'| y |θ''| recorriendo
+    las muestras en bucles simples (pensado para compilarse con Numba).
+    """
+    n = arr_t.shape[0]
+    theta = np.empty(n)
+    theta_sum = 0.0
+    max_abs_theta = 0.0
+    radius_sum = 0.0
+    for i in range(n):
+        dx = arr_x[i] - px
+        dy = arr_y[i] - py
+        th = np.arctan2(dx, dy)
+        theta[i] = th
+        theta_sum += th
+        max_abs_theta = max(max_abs_theta, abs(th))
+        radius_sum += np.sqrt(dx * dx + dy * dy)
+
+    theta_dot = np.empty(n)
+    theta_ddot = np.empty(n)
+    _gradient_kernel(theta, arr_t, theta_dot)
+    _gradient_kernel(theta_dot, arr_t, theta_ddot)
+    # np.max y no max(): con tiempos repetidos las derivadas son inf/NaN y el NaN
+    # tiene que propagarse igual que en _stats_numpy
+    max_dot = np.max(np.abs(theta_dot))
+    max_ddot = np.max(np.abs(theta_ddot))
+
+    return theta, theta_sum / n, max_abs_theta, radius_sum / n, max_dot, max_ddot
+
+
+def _gradient_weights(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float, float]:
+    """Pesos de las diferencias centradas de np.gradient para la malla x (no uniforme)."""
+    h = np.diff(x)
+    h1 = h[:-1]
+    h2 = h[1:]
+    a = -h2 / (h1 * (h1 + h2))
+    b = (h2 - h1) / (h1 * h2)
+    c = h1 / (h2 * (h1 + h2))
+    return a, b, c, float(h[0]), float(h[-1])
+
+
+def _apply_gradient(f: np.ndarray, weights, out: np.ndarray) -> np.ndarray:
+    """Equivale a np.gradient(f, x) reutilizando los pesos de _gradient_weights(x)."""
+    a, b, c, h_first, h_last = weights
+    np.multiply(a, f[:-2], out=out[1:-1])
+    out[1:-1] += b * f[1:-1]
+    out[1:-1] += c * f[2:]
+    out[0] = (f[1] - f[0]) / h_first
+    out[-1] = (f[-1] - f[-2]) / h_last
+    return out
+
+
+def _stats_numpy(arr_t, arr_x, arr_y, px, py):
+    """Misma salida que _stats_loop con operaciones vectorizadas de NumPy."""
+    dx = arr_x - px
+    dy = arr_y - py
+    theta = np.arctan2(dx, dy)
+    # los pesos dependen solo de los tiempos: se calculan una vez para θ' y θ''
+    weights = _gradient_weights(arr_t)
+    theta_dot = _apply_gradient(theta, weights, np.empty_like(theta))
+    theta_ddot = _apply_gradient(theta_dot, weights, np.empty_like(theta))
+    return (
+        theta,
+        float(np.mean(theta)),
+        float(np.max(np.abs(theta))),
+        float(np.mean(np.sqrt(dx ** 2 + dy ** 2))),
+        float(np.max(np.abs(theta_dot))),
+        float(np.max(np.abs(theta_ddot))),
+    )
+
+
+if numba is not None:
+    # Sin cache=True: este módulo se importa como "pendulum_processor" (app.py) y
+    # como "backend.pendulum_processor" (main.py, pendulo_fisica.py); la caché en
+    # disco guarda el nombre del módulo y falla al cargarla desde el otro.
+    _gradient_kernel = numba.njit(error_model="numpy")(_gradient_loop)
+    _stats_kernel = numba.njit(error_model="numpy")(_stats_loop)
+else:
+    _gradient_kernel = _gradient_numpy
+    _stats_kernel = _stats_numpy
+
+
+def warm_up_kernels() -> None:
+    """
+    Compila los kernels de Numba (~1 s) con una serie mínima, para que no lo pague
+    la primera petición de análisis. Sin Numba no hace nada útil (es NumPy).
+    """
+    samples = np.arange(3, dtype=np.float64)
+    _stats_kernel(samples, samples, samples, 0.0, 0.0)
+
+
 def _compute_physical_stats(times, xs, ys, pivot_x=None, pivot_y=None, fallback_px=230, fallback_py=120):
     """Calcula periodo, frecuencia, amplitud angular, etc."""
     if len(times) < 3:
@@ -87,16 +378,14 @@ def _compute_physical_stats(times, xs, ys, pivot_x=None, pivot_y=None, fallback_
     px = pivot_x if pivot_x is not None else fallback_px
     py = pivot_y if pivot_y is not None else fallback_py
 
-    arr_t = np.array(times)
-    arr_x = _savgol_or_original(xs)
-    arr_y = _savgol_or_original(ys)
-
-    dx = arr_x - px
-    dy = arr_y - py
+    arr_t = np.asarray(times, dtype=np.float64)
+    arr_x = np.asarray(_savgol_or_original(xs), dtype=np.float64)
+    arr_y = np.asarray(_savgol_or_original(ys), dtype=np.float64)
 
-    theta = np.arctan2(dx, dy)
-    theta_centered = theta - np.mean(theta)
-    theta_deg = np.degrees(theta)
+    theta, theta_mean, max_abs_theta, length_px, max_ang_velocity, max_ang_acceleration = _stats_kernel(
+        arr_t, arr_x, arr_y, float(px), float(py)
+    )
+    theta_centered = theta - theta_mean
 
     crossings = _zero_crossings(arr_t, theta_centered)
     oscillations = len(crossings) / 2 if crossings else 0.0
@@ -107,13 +396,6 @@ def _compute_physical_stats(times, xs, ys, pivot_x=None, pivot_y=None, fallback_
     angular_frequency = (2 * np.pi / period) if period and period > 0 else None
 
     total_time = float(arr_t[-1] - arr_t[0]) if len(arr_t) > 1 else 0.0
-    length_px = float(np.mean(np.sqrt(dx ** 2 + dy ** 2)))
-
-    theta_dot = np.gradient(theta, arr_t)
-    theta_ddot = np.gradient(theta_dot, arr_t)
-
-    max_ang_velocity = float(np.max(np.abs(theta_dot)))
-    max_ang_acceleration = float(np.max(np.abs(theta_ddot)))
 
     return PendulumStats(
         total_time=total_time,
@@ -122,10 +404,10 @@ def _compute_physical_stats(times, xs, ys, pivot_x=None, pivot_y=None, fallback_
         period=period,
         frequency=frequency,
         angular_frequency=angular_frequency,
-        max_angle_deg=float(np.max(np.abs(theta_deg))),
-        length_px=length_px,
-        max_ang_velocity=max_ang_velocity,
-        max_ang_acceleration=max_ang_acceleration,
+        max_angle_deg=float(np.degrees(max_abs_theta)),
+        length_px=float(length_px),
+        max_ang_velocity=float(max_ang_velocity),
+        max_ang_acceleration=float(max_ang_acceleration),
         pivot_x=float(px),
         pivot_y=float(py),
     )
@@ -141,7 +423,7 @@ def generate_angle_plot(times, xs, ys, pivot_x=None, pivot_y=None, fallback_px=2
     px = pivot_x if pivot_x is not None else fallback_px
     py = pivot_y if pivot_y is not None else fallback_py
 
-    arr_t = np.array(times)
+    arr_t = np.asarray(times, dtype=np.float64)
     arr_x = _savgol_or_original(xs)
     arr_y = _savgol_or_original(ys)
 
@@ -150,38 +432,49 @@ def generate_angle_plot(times, xs, ys, pivot_x=None, pivot_y=None, fallback_px=2
     theta_deg = np.degrees(np.arctan2(dx, dy))
     theta_smooth = _savgol_or_original(theta_deg)
 
-    fig, ax = plt.subplots(figsize=(6, 8))
-    ax.plot(arr_t, theta_deg, ".", alpha=0.2, label="Ángulo crudo (ruido)")
-    ax.plot(arr_t, theta_smooth, "-", linewidth=2, label="Ángulo suavizado (real)")
-    ax.set_xlabel("Tiempo (s)")
-    ax.set_ylabel("Ángulo θ (grados)")
-    ax.set_title("Ángulo del péndulo vs tiempo (en tiempo real)")
-    ax.grid(True)
-    ax.legend()
-    fig.tight_layout()
-
     buff = io.BytesIO()
-    fig.savefig(buff, format="png", bbox_inches="tight")
-    plt.close(fig)
-    return base64.b64encode(buff.getvalue()).decode("ascii")
+    with _PLOT_LOCK:
+        ax = _PLOT_AX
+        ax.cla()
+        ax.plot(arr_t, theta_deg, ".", alpha=0.2, label="Ángulo crudo (ruido)")
+        ax.plot(arr_t, theta_smooth, "-", linewidth=2, label="Ángulo suavizado (real)")
+        ax.set_xlabel("Tiempo (s)")
+        ax.set_ylabel("Ángulo θ (grados)")
+        ax.set_title("Ángulo del péndulo vs tiempo (en tiempo real)")
+        ax.grid(True)
+        ax.legend()
+        _PLOT_FIG.tight_layout()
+        _PLOT_CANVAS.print_png(buff)
+    return b64codec.b64encode(buff.getvalue()).decode("ascii")
 
 
 def build_plot_and_stats(times, xs, ys, pivot_x=None, pivot_y=None, fallback_px=230, fallback_py=120):
     """
     Devuelve {"plot": <b64 png>, "stats": {...}} usando la misma lógica que main.py/graficar.py.
+    Acepta listas o arrays de NumPy; se convierten una sola vez a float64 contiguo.
     """
+    times = np.ascontiguousarray(times, dtype=np.float64)
+    xs = np.ascontiguousarray(xs, dtype=np.float64)
+    ys = np.ascontiguousarray(ys, dtype=np.float64)
     plot_b64 = generate_angle_plot(times, xs, ys, pivot_x=pivot_x, pivot_y=pivot_y, fallback_px=fallback_px, fallback_py=fallback_py)
     stats_obj = _compute_physical_stats(times, xs, ys, pivot_x=pivot_x, pivot_y=pivot_y, fallback_px=fallback_px, fallback_py=fallback_py)
     stats = asdict(stats_obj) if stats_obj else None
     return {"plot": plot_b64, "stats": stats}
 
 
+_CSV_ROW_FORMAT = "%d,%r,%d,%d,%d\r\n"  # frame, tiempo_s, x, y, radio
+
+
 class PendulumProcessor:
     """
     Procesa frames de video de un péndulo para detectar la bola, medir ángulos
     y devolver un frame marcado más metadatos. Mantiene estado entre frames.
+    Las muestras se guardan en arrays NumPy preasignados (uno por columna) que
+    duplican su capacidad al llenarse.
     """
 
+    INITIAL_CAPACITY = 1024
+
     def __init__(self, fps: float = 30.0, pivot_x: int = 230, pivot_y: int = 120, enable_plot: bool = False):
         self.fps = fps
         self.default_pivot_x = pivot_x
@@ -189,10 +482,14 @@ class PendulumProcessor:
         self.enable_plot = enable_plot
 
         self.frame_idx = 0
-        self.time_series: List[float] = []
-        self.x_series: List[int] = []
-        self.y_series: List[int] = []
-        self.records: List[Tuple[int, float, int, int, int]] = []
+        self._n = 0
+        self._frames = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        self._t = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._x = np.empty(self.INITIAL_CAPACITY, dtype=np.int32)
+        self._y = np.empty(self.INITIAL_CAPACITY, dtype=np.int32)
+        self._r = np.empty(self.INITIAL_CAPACITY, dtype=np.int32)
+        self._dx = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)  # x - center_x al detectar
+        self._sides_counted = 0  # muestras ya incluidas en sign_changes
 
         self.center_x: Optional[float] = None
         self.line_y: Optional[int] = None
@@ -201,61 +498,123 @@ class PendulumProcessor:
         self.sign_changes = 0
         self.oscillations = 0.0
 
-        self.kernel = np.ones((5, 5), np.uint8)
+        # 5x5 a resolución completa; se reduce con DETECT_DOWNSCALE (mínimo 3x3)
+        kernel_size = max(3, (5 // DETECT_DOWNSCALE) | 1)
+        self.kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        self._display: Optional[np.ndarray] = None  # buffer de salida reutilizado entre frames
+        self._buffers: Dict[str, np.ndarray] = {}  # máscaras/HSV intermedios (ver _scratch)
+        self._gpu: Optional[Tuple] = None  # GpuMat (origen, hsv, máscara) reutilizados con CUDA
+
+    def _grow(self):
+        """Duplica la capacidad de los arrays de muestras."""
+        capacity = self._t.size * 2
+        self._frames = np.resize(self._frames, capacity)
+        self._t = np.resize(self._t, capacity)
+        self._x = np.resize(self._x, capacity)
+        self._y = np.resize(self._y, capacity)
+        self._r = np.resize(self._r, capacity)
+        self._dx = np.resize(self._dx, capacity)
+
+    def _append_sample(self, frame_idx: int, tiempo_s: float, x: int, y: int, r: int, dx: float):
+        n = self._n
+        if n == self._t.size:
+            self._grow()
+        self._frames[n] = frame_idx
+        self._t[n] = tiempo_s
+        self._x[n] = x
+        self._y[n] = y
+        self._r[n] = r
+        self._dx[n] = dx
+        # se incrementa al final: un lector en otro hilo nunca ve una fila a medias
+        self._n = n + 1
+
+    def recount_oscillations(self) -> float:
+        """
+        Incorpora al contador las muestras pendientes de una sola pasada: lado de
+        cada muestra (-1/0/1 con DEAD_ZONE) y cambios de lado ignorando los ceros.
+        """
+        n = self._n
+        dx = self._dx[self._sides_counted:n]
+        if dx.size:
+            sides = np.where(np.abs(dx) <= DEAD_ZONE, 0, np.sign(dx)).astype(np.int8)
+            nz = sides[sides != 0]
+            if nz.size:
+                changes = int(np.count_nonzero(nz[1:] != nz[:-1]))
+                if self.last_side != 0 and nz[0] != self.last_side:
+                    changes += 1
+                self.sign_changes += changes
+                self.oscillations = self.sign_changes // 2
+                self.last_side = int(nz[-1])
+            self._sides_counted = n
+        return self.oscillations
+
+    def _scratch(self, name: str, shape: Tuple[int, ...], host: bool = False) -> Optional[np.ndarray]:
+        """
+        Buffer uint8 reutilizado entre frames para el dst= de OpenCV; solo se
+        reasigna si cambia la forma. Con OpenCL activo devuelve None (OpenCV
+        gestiona los UMat), salvo host=True para imágenes que siguen en CPU.
+        """
+        if not host and _opencl_enabled():
+            return None
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, np.uint8)
+            self._buffers[name] = buf
+        return buf
+
+    def _downscaled(self, name: str, img: np.ndarray) -> np.ndarray:
+        """Reduce la imagen en DETECT_DOWNSCALE (promediando píxeles)."""
+        if DETECT_DOWNSCALE == 1:
+            return img
+        height, width = img.shape[:2]
+        shape = (height // DETECT_DOWNSCALE, width // DETECT_DOWNSCALE) + img.shape[2:]
+        dst = self._scratch(name, shape, host=True)
+        return cv2.resize(img, (shape[1], shape[0]), dst=dst, interpolation=cv2.INTER_AREA)
+
+    def _cuda_orange_mask(self, small: np.ndarray) -> np.ndarray:
+        """cvtColor + inRange de la bola en la GPU; devuelve la máscara ya en CPU."""
+        if self._gpu is None:
+            self._gpu = (cv2.cuda_GpuMat(), cv2.cuda_GpuMat(), cv2.cuda_GpuMat())
+        gpu_src, gpu_hsv, gpu_mask = self._gpu
+        gpu_src.upload(small)
+        cv2.cuda.cvtColor(gpu_src, cv2.COLOR_BGR2HSV, dst=gpu_hsv)
+        cv2.cuda.inRange(gpu_hsv, _ORANGE_LOWER_SCALAR, _ORANGE_UPPER_SCALAR, dst=gpu_mask)
+        return gpu_mask.download(dst=self._scratch("mask_orange", small.shape[:2], host=True))
 
     def _detect_vertices_and_line(self, frame, display):
         """Detecta vértices rojos y la línea blanca, actualiza center_x y line_y."""
         height, width = frame.shape[:2]
         top_roi = frame[0:height // 2, :]
 
-        hsv_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2HSV)
-        gray_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2GRAY)
-
-        lower_red1 = np.array([0, 100, 80], dtype=np.uint8)
-        upper_red1 = np.array([10, 255, 255], dtype=np.uint8)
-        lower_red2 = np.array([170, 100, 80], dtype=np.uint8)
-        upper_red2 = np.array([180, 255, 255], dtype=np.uint8)
-
-        mask_red1 = cv2.inRange(hsv_top, lower_red1, upper_red1)
-        mask_red2 = cv2.inRange(hsv_top, lower_red2, upper_red2)
-        mask_red = cv2.bitwise_or(mask_red1, mask_red2)
+        small_top = self._downscaled("small_top", top_roi)
+        mask_shape = small_top.shape[:2]
+        hsv_top = cv2.cvtColor(_to_device(small_top), cv2.COLOR_BGR2HSV, dst=self._scratch("hsv_top", small_top.shape))
+        hsv_top = cv2.LUT(hsv_top, _RED_HUE_LUT, dst=hsv_top)
+        mask_red = cv2.inRange(hsv_top, RED_LOWER, RED_UPPER, dst=self._scratch("mask_red", mask_shape))
 
-        mask_red = cv2.morphologyEx(mask_red, cv2.MORPH_OPEN, self.kernel, iterations=1)
-        mask_red = cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, self.kernel, iterations=1)
+        mask_tmp = cv2.morphologyEx(mask_red, cv2.MORPH_OPEN, self.kernel, dst=self._scratch("mask_red_tmp", mask_shape), iterations=1)
+        mask_red = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, self.kernel, dst=mask_red, iterations=1)
 
-        conts_center, _ = cv2.findContours(mask_red, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        puntos_vertices = []
+        # área y centroide de cada mancha roja en una sola pasada (etiqueta 0 = fondo)
+        _, _, blob_stats, centroids = cv2.connectedComponentsWithStats(_to_host(mask_red), connectivity=8)
+        keep = blob_stats[1:, cv2.CC_STAT_AREA] >= MIN_VERTEX_AREA / DETECT_DOWNSCALE ** 2
+        puntos_vertices = [tuple(p) for p in _upscale(centroids[1:][keep]).astype(int).tolist()]
 
-        for c in conts_center:
-            area = cv2.contourArea(c)
-            if area < 10:
-                continue
-
-            M = cv2.moments(c)
-            if M["m00"] == 0:
-                continue
-
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-
-            gx = cx
-            gy = cy
-            puntos_vertices.append((gx, gy))
-
-        _, bin_white = cv2.threshold(gray_top, 200, 255, cv2.THRESH_BINARY)
-        bin_white = cv2.morphologyEx(bin_white, cv2.MORPH_OPEN, self.kernel, iterations=1)
-        bin_white = cv2.morphologyEx(bin_white, cv2.MORPH_CLOSE, self.kernel, iterations=1)
-
-        conts_white, _ = cv2.findContours(bin_white, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # La línea blanca es una franja horizontal: basta contar píxeles blancos por fila.
+        # Es fina, así que se busca a resolución completa.
+        gray_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2GRAY, dst=self._scratch("gray_top", top_roi.shape[:2], host=True))
+        _, bin_white = cv2.threshold(gray_top, 200, 1, cv2.THRESH_BINARY, dst=gray_top)
+        row_counts = cv2.reduce(bin_white, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
 
         candidate_line_y = None
-        max_width = 0
-
-        for c in conts_white:
-            xw, yw, ww, hw = cv2.boundingRect(c)
-            if ww > max_width and ww > width * 0.4 and hw < 30:
-                max_width = ww
-                candidate_line_y = yw + hw // 2
+        peak = int(np.argmax(row_counts))
+        if row_counts[peak] > width * 0.4:
+            # franja = filas contiguas al pico que también superan el umbral
+            weak = np.flatnonzero(row_counts <= width * 0.4)
+            top = int(weak[weak < peak].max()) + 1 if np.any(weak < peak) else 0
+            bottom = int(weak[weak > peak].min()) if np.any(weak > peak) else row_counts.size
+            if bottom - top < 30:
+                candidate_line_y = top + (bottom - top) // 2
 
         if candidate_line_y is not None:
             self.line_y = candidate_line_y
@@ -289,23 +648,35 @@ class PendulumProcessor:
         """
         Procesa un solo frame y devuelve (frame_marcado, info_dict).
         timestamp: tiempo en segundos si viene del cliente; si no, se usa frame_idx / fps.
+        El frame marcado es un buffer interno que se sobrescribe en la siguiente
+        llamada: hay que codificarlo o copiarlo antes de procesar otro frame.
         """
         height, width = frame.shape[:2]
         roi_top = int(height * 0.25)
         tiempo_s = float(timestamp) if timestamp is not None else (self.frame_idx / self.fps if self.fps else float(self.frame_idx))
 
-        display = frame.copy()
+        if self._display is None or self._display.shape != frame.shape or self._display.dtype != frame.dtype:
+            self._display = np.empty_like(frame)
+        display = self._display
+        np.copyto(display, frame)
 
         self._detect_vertices_and_line(frame, display)
 
         roi = frame[roi_top:, :]
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        small = self._downscaled("small_low", roi)
+        mask_shape = small.shape[:2]
+        use_cuda = _cuda_enabled()
+        if use_cuda:
+            mask = self._cuda_orange_mask(small)
+        else:
+            hsv = cv2.cvtColor(_to_device(small), cv2.COLOR_BGR2HSV, dst=self._scratch("hsv_low", small.shape))
+            mask = cv2.inRange(hsv, ORANGE_LOWER, ORANGE_UPPER, dst=self._scratch("mask_orange", mask_shape))
 
-        mask = cv2.inRange(hsv, ORANGE_LOWER, ORANGE_UPPER)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, iterations=1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel, iterations=2)
+        mask_tmp = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=self._scratch("mask_tmp", mask_shape, host=use_cuda), iterations=1)
+        mask = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, self.kernel, dst=mask, iterations=2)
 
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # findContours solo existe en CPU
+        contours, _ = cv2.findContours(_to_host(mask), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         info: Dict[str, Optional[float]] = {
             "time_s": tiempo_s,
@@ -319,26 +690,16 @@ class PendulumProcessor:
 
         if contours and self.center_x is not None:
             c = max(contours, key=cv2.contourArea)
-            if cv2.contourArea(c) > MIN_CONTOUR_AREA:
+            if cv2.contourArea(c) > MIN_CONTOUR_AREA / DETECT_DOWNSCALE ** 2:
                 (x_roi, y_roi), radius = cv2.minEnclosingCircle(c)
-                x = int(x_roi)
-                y = int(y_roi + roi_top)
-                r = int(radius)
+                x = int(_upscale(x_roi))
+                y = int(_upscale(y_roi) + roi_top)
+                r = int(radius * DETECT_DOWNSCALE)  # longitud: sin el desplazamiento de centros de píxel
 
-                self.records.append((self.frame_idx, tiempo_s, x, y, r))
-
-                dx = x - self.center_x
-                if abs(dx) <= DEAD_ZONE:
-                    side = 0
-                else:
-                    side = 1 if dx > 0 else -1
-
-                if self.last_side != 0 and side != 0 and side != self.last_side:
-                    self.sign_changes += 1
-                    self.oscillations = self.sign_changes // 2
-
-                if side != 0:
-                    self.last_side = side
+                # el lado se mide contra el centro de este frame; el recuento va por lotes
+                self._append_sample(self.frame_idx, tiempo_s, x, y, r, x - self.center_x)
+                if self._n - self._sides_counted >= OSCILLATION_RECOUNT_EVERY:
+                    self.recount_oscillations()
 
                 cv2.circle(display, (x, y), r, (0, 165, 255), 3)
                 cv2.circle(display, (x, y), 3, (0, 255, 0), -1)
@@ -347,10 +708,6 @@ class PendulumProcessor:
                 x2, y2 = min(width, x + r), min(height, y + r)
                 cv2.rectangle(display, (x1, y1), (x2, y2), (0, 200, 255), 2)
 
-                self.time_series.append(tiempo_s)
-                self.x_series.append(x)
-                self.y_series.append(y)
-
                 info.update(
                     {
                         "x": float(x),
@@ -377,71 +734,152 @@ class PendulumProcessor:
         self.frame_idx += 1
         return display, info
 
+    def series(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vistas (sin copia) de tiempos, x e y con las muestras detectadas hasta ahora."""
+        n = self._n
+        return self._t[:n], self._x[:n], self._y[:n]
+
+    @property
+    def time_series(self) -> np.ndarray:
+        return self._t[:self._n]
+
+    @property
+    def x_series(self) -> np.ndarray:
+        return self._x[:self._n]
+
+    @property
+    def y_series(self) -> np.ndarray:
+        return self._y[:self._n]
+
+    def last_record(self) -> Optional[Tuple[int, float, int, int, int]]:
+        """Última fila (frame, tiempo, x, y, radio) o None si no hay muestras."""
+        n = self._n
+        if not n:
+            return None
+        i = n - 1
+        return (int(self._frames[i]), float(self._t[i]), int(self._x[i]), int(self._y[i]), int(self._r[i]))
+
     def get_stats(self) -> Optional[PendulumStats]:
+        self.recount_oscillations()  # incluir el último lote parcial (< OSCILLATION_RECOUNT_EVERY)
         pivot_x = self.center_x if self.center_x is not None else self.default_pivot_x
         pivot_y = self.line_y if self.line_y is not None else self.default_pivot_y
-        return _compute_physical_stats(self.time_series, self.x_series, self.y_series, pivot_x=pivot_x, pivot_y=pivot_y, fallback_px=pivot_x, fallback_py=pivot_y)
+        times, xs, ys = self.series()
+        return _compute_physical_stats(times, xs, ys, pivot_x=pivot_x, pivot_y=pivot_y, fallback_px=pivot_x, fallback_py=pivot_y)
 
     def export_csv(self, path: str):
         """Guarda los datos de (frame, tiempo, x, y, radio) en un CSV."""
+        n = self._n
+        columns = (self._frames[:n], self._t[:n], self._x[:n], self._y[:n], self._r[:n])
+        # un solo % por fila; %r da el mismo texto que csv.writer / SegmentWriter
+        rows = map(_CSV_ROW_FORMAT.__mod__, zip(*(col.tolist() for col in columns)))
         with open(path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["frame", "tiempo_s", "x", "y", "radio"])
-            writer.writerows(self.records)
+            f.write("frame,tiempo_s,x,y,radio\r\n")
+            f.write("".join(rows))
 
     @property
     def has_data(self) -> bool:
-        return bool(self.records)
+        return self._n > 0
 
 
 def b64_to_frame(b64_data: str) -> np.ndarray:
     """Decode base64-encoded JPEG/PNG string to an OpenCV BGR frame."""
-    return cv2.imdecode(np.frombuffer(base64.b64decode(b64_data), np.uint8), cv2.IMREAD_COLOR)
+    return cv2.imdecode(np.frombuffer(b64codec.b64decode(b64_data), np.uint8), cv2.IMREAD_COLOR)
+
+
+def frame_to_jpeg_bytes(frame: np.ndarray, quality: int = STREAM_JPEG_QUALITY) -> bytes:
+    """Encode an OpenCV BGR frame to raw JPEG bytes."""
+    if _turbojpeg is not None:
+        # 4:2:0 igual que cv2.imencode
+        return _turbojpeg.encode(
+            np.ascontiguousarray(frame), quality=int(quality), pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420
+        )
+    params = [cv2.IMWRITE_JPEG_QUALITY, int(quality), cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+    ok, buf = cv2.imencode(".jpg", frame, params)
+    if not ok:
+        raise ValueError("Failed to encode frame")
+    return buf.tobytes()
 
 
 def frame_to_b64(frame: np.ndarray) -> str:
     """Encode an OpenCV BGR frame to base64-encoded JPEG."""
-    ok, buf = cv2.imencode(".jpg", frame)
-    if not ok:
-        raise ValueError("Failed to encode frame")
-    return base64.b64encode(buf).decode()
+    return b64codec.b64encode(frame_to_jpeg_bytes(frame)).decode()
 
 
-def decode_ws_message(message) -> Tuple[np.ndarray, Optional[float], Optional[float]]:
+def encode_ws_message(frame: np.ndarray, header: Dict) -> bytes:
+    """
+    Empaqueta un frame y sus metadatos en un único mensaje binario:
+    <uint32 LE longitud del header> + <header JSON UTF-8> + <JPEG>.
+    Evita pasar la imagen por base64 y por el encoder JSON.
+    """
+    header_bytes = json_bytes(header)
+    return struct.pack("<I", len(header_bytes)) + header_bytes + frame_to_jpeg_bytes(frame)
+
+
+def is_json_message(message) -> bool:
+    """
+    True si el mensaje (texto o binario) es un objeto JSON. Mira solo el primer
+    carácter/byte; el lstrip() (que copia el frame entero) solo se hace si el
+    mensaje empieza por espacio.
+    """
+    if isinstance(message, str):
+        first = message[:1]
+        return first == "{" or (first.isspace() and message.lstrip()[:1] == "{")
+    if isinstance(message, (bytes, bytearray)):
+        first = message[:1]
+        return first == b"{" or (first.isspace() and message.lstrip()[:1] == b"{")
+    return False
+
+
+def decode_ws_message(message) -> Tuple[np.ndarray, Optional[float], Optional[float], Optional[str]]:
     """
     Decodifica un mensaje WebSocket que puede ser:
-    - JSON con {frame: <b64>, fps?, timestamp?}
+    - JSON con {frame: <b64>, fps?, timestamp?, session_id?}
     - Texto base64
     - Binario con la imagen comprimida
-    Devuelve (frame_bgr, fps_override, timestamp).
+    Devuelve (frame_bgr, fps_override, timestamp, session_id).
+    El JSON se parsea una sola vez (msgspec u orjson si están instalados).
     """
     fps_override = None
     timestamp = None
+    session_id = None
+
+    # JSON enviado como binario: se parsea tal cual (msgspec/orjson aceptan bytes),
+    # sin intentar antes imdecode ni pasar por .decode()
+    json_input = is_json_message(message)
 
-    if isinstance(message, bytes):
+    if isinstance(message, (bytes, bytearray)) and not json_input:
         arr = np.frombuffer(message, np.uint8)
         frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
         if frame is not None:
-            return frame, fps_override, timestamp
+            return frame, fps_override, timestamp, session_id
         try:
             message = message.decode()
         except Exception as exc:
             raise ValueError("No se pudo decodificar mensaje binario") from exc
-
-    if isinstance(message, str) and message.lstrip().startswith("{"):
-        payload = json.loads(message)
-        if "fps" in payload:
-            fps_override = float(payload["fps"])
-        if "timestamp" in payload:
-            timestamp = float(payload["timestamp"])
-        frame_b64 = payload.get("frame")
+        json_input = is_json_message(message)
+
+    if json_input:
+        if _ws_decoder is not None:
+            msg = _ws_decoder.decode(message)
+            fps_override = msg.fps
+            timestamp = msg.timestamp
+            session_id = msg.session_id
+            frame_b64 = msg.frame
+        else:
+            payload = _json_loads(message)
+            if "fps" in payload:
+                fps_override = float(payload["fps"])
+            if "timestamp" in payload:
+                timestamp = float(payload["timestamp"])
+            session_id = payload.get("session_id")
+            frame_b64 = payload.get("frame")
         if not frame_b64:
             raise ValueError("El JSON debe incluir 'frame' en base64")
         frame = b64_to_frame(frame_b64)
-        return frame, fps_override, timestamp
+        return frame, fps_override, timestamp, session_id
 
     if isinstance(message, str):
         frame = b64_to_frame(message)
-        return frame, fps_override, timestamp
+        return frame, fps_override, timestamp, session_id
 
     raise ValueError("Formato de mensaje no soportado")
@@ -8,6 +8,8 @@ set -euo pipefail
 #   USE_HTTPS   (default 1)
 #   SSL_CERT    (default backend/cert.crt)
 #   SSL_KEY     (default backend/cert.key)
+#   DEV         (1 = servidor de desarrollo de Flask con debug; default 0 = gunicorn)
+#   THREADS     (hilos del worker de gunicorn, default 32)
 
 ROOT="$(cd "$(dirname "$0")" && pwd)"
 cd "$ROOT"
@@ -17,6 +19,8 @@ export BACKEND_PORT="${BACKEND_PORT:-5000}"
 export USE_HTTPS="${USE_HTTPS:-1}"
 export SSL_CERT="${SSL_CERT:-$ROOT/cert.crt}"
 export SSL_KEY="${SSL_KEY:-$ROOT/cert.key}"
+DEV="${DEV:-0}"
+THREADS="${THREADS:-32}"
 
 if [ "${USE_HTTPS}" = "1" ]; then
   if [ ! -f "$SSL_CERT" ] || [ ! -f "$SSL_KEY" ]; then
@@ -28,4 +32,15 @@ if [ "${USE_HTTPS}" = "1" ]; then
 fi
 
 echo "Backend escuchando en ${BACKEND_HOST}:${BACKEND_PORT} (HTTPS=${USE_HTTPS})"
-python3 app.py
+if [ "${DEV}" = "1" ]; then
+  DEV=1 python3 app.py
+  exit
+fi
+
+# Un solo worker: las sesiones viven en memoria del proceso (ver wsgi.py).
+TLS_ARGS=()
+if [ "${USE_HTTPS}" = "1" ]; then
+  TLS_ARGS=(--certfile "$SSL_CERT" --keyfile "$SSL_KEY")
+fi
+exec gunicorn -k gthread -w 1 --threads "$THREADS" \
+  --bind "${BACKEND_HOST}:${BACKEND_PORT}" ${TLS_ARGS[@]+"${TLS_ARGS[@]}"} wsgi:app
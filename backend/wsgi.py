@@ -0,0 +1,12 @@
+"""
+Punto de entrada WSGI para producción (en lugar del servidor de desarrollo):
+
+    gunicorn -k gthread -w 1 --threads 32 --bind 0.0.0.0:5000 \
+        --certfile cert.crt --keyfile cert.key wsgi:app
+
+Un solo worker a propósito: las sesiones (session_store, CSVs, puerto serie)
+viven en la memoria del proceso. La concurrencia la dan los hilos: cada
+WebSocket ocupa uno y OpenCV/NumPy liberan el GIL mientras procesan el frame.
+"""
+
+from app import app  # noqa: F401
@@ -1,16 +1,58 @@
 import csv
-from dataclasses import dataclass
-from typing import Optional
+import os
+import queue
+import threading
 
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.signal import savgol_filter
+
+# Helpers compartidos con el backend (SG con coeficientes en caché, cruces
+# vectorizados, kernel de estadísticas, rango de rojo con el tono rotado): una
+# sola implementación. DETECT_DOWNSCALE (variable de entorno, por defecto 1) es
+# también el factor con el que aquí se reducen las ROI antes de detectar.
+from backend.pendulum_processor import (
+    DETECT_DOWNSCALE,
+    RED_LOWER,
+    RED_UPPER,
+    _RED_HUE_LUT,
+    PendulumStats,
+    _compute_physical_stats,
+    _savgol_kernels,
+    _savgol_or_original,
+    _upscale,
+)
 
 VIDEO_PATH = "pendulo12.mp4"
-OUTPUT_VIDEO = "pendulo_marcado.mp4"
+# Códec del video marcado. OUTPUT_FOURCC=MJPG escribe un .avi MJPEG (cada frame
+# es un JPEG independiente; con varios núcleos se codifica más rápido pero
+# ocupa bastante más); por defecto mp4v, como siempre.
+OUTPUT_FOURCC = os.getenv("OUTPUT_FOURCC", "mp4v")
+OUTPUT_VIDEO = "pendulo_marcado.avi" if OUTPUT_FOURCC == "MJPG" else "pendulo_marcado.mp4"
 CSV_PATH = "datos_pendulo.csv"
 
+# Procesar 1 de cada N frames (1 = todos). Los saltados solo se hacen grab(),
+# sin decodificar ni convertir a BGR. El video de salida se escribe a fps / N.
+PROCESS_EVERY_N = 1
+
+# Ventana de OpenCV y gráfica en vivo; SHOW_UI=0 para procesar sin interfaz
+# (sin imshow/waitKey ni matplotlib por frame, más rápido en lote)
+SHOW_UI = os.getenv("SHOW_UI", "1") != "0"
+
+# La gráfica en vivo se redibuja cada PLOT_EVERY muestras (redibujar con
+# matplotlib cuesta decenas de ms; la serie completa se dibuja al final)
+PLOT_EVERY = 5
+
+# Filas del CSV acumuladas antes de escribirlas de golpe con writerows()
+CSV_FLUSH_EVERY = 256
+
+# Hilos internos de OpenCV (inRange, morfología, resize...): la mitad de los
+# núcleos, el resto queda para los hilos de lectura/escritura y matplotlib
+CV_NUM_THREADS = max(1, (os.cpu_count() or 1) // 2)
+
+# Frames en cola entre hilos: lectura -> análisis (hilo principal) -> escritura
+PIPELINE_QUEUE_SIZE = 4
+
 # ------------ CONFIGURACIÓN PARA BOLA NARANJA SOBRE FONDO NEGRO ------------
 
 ORANGE_LOWER = np.array([5, 140, 80], dtype=np.uint8)   # H, S, V
@@ -21,6 +63,11 @@ DEAD_ZONE       = 5      # px alrededor del centro que se consideran "centro"
 
 # Suavizado del centro (0 = no usa valor previo, 1 = no cambia nunca)
 CENTER_ALPHA    = 0.8    # cuanto más alto, más suave/estable el centro
+
+# Elemento estructurante de la morfología: 5x5 a resolución completa, reducido
+# con DETECT_DOWNSCALE (mínimo 3x3). Se crea una vez, no en cada frame.
+_KERNEL_SIZE = max(3, (5 // DETECT_DOWNSCALE) | 1)
+MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (_KERNEL_SIZE, _KERNEL_SIZE))
 # ----------------------------------------------------------------------------
 
 # ------------ CONFIGURACIÓN PARA LA GRÁFICA DEL ÁNGULO ----------------------
@@ -29,36 +76,63 @@ PIVOT_Y = 120
 # ----------------------------------------------------------------------------
 
 
-def _savgol_or_original(values, polyorder=3):
-    """Devuelve la señal suavizada si hay suficientes datos para Savitzky-Golay."""
-    count = len(values)
-    if count < polyorder + 2:
-        return np.array(values)
-
-    window = 41 if count > 50 else 9
-    if window >= count:
-        window = count if count % 2 == 1 else count - 1
-
-    if window < polyorder + 2:
-        return np.array(values)
-
-    return savgol_filter(values, window_length=window, polyorder=polyorder)
-
-
-def _update_angle_plot(ax, line_raw, line_smooth, times, xs, ys, pivot_x=None, pivot_y=None):
-    """Actualiza la gráfica del ángulo del péndulo."""
-    if not xs:
+class _TailSmoother:
+    """
+    Mismo resultado que _savgol_or_original para una serie que solo crece por el
+    final. Con más de 50 muestras la ventana queda fija (41) y el valor suavizado
+    de una muestra es definitivo en cuanto tiene media ventana detrás: solo se
+    calculan las muestras nuevas y la cola, no toda la serie en cada frame.
+    """
+
+    WINDOW = 41
+    POLYORDER = 3
+
+    def __init__(self):
+        self._buf = np.empty(0)
+        self._final = 0  # muestras cuyo valor suavizado ya no cambia
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        n = values.size
+        half = self.WINDOW // 2
+        if n <= 50 or self._final == 0 or n < self._final + half:
+            # serie corta (la ventana aún cambia) o serie nueva: cálculo completo
+            smooth = np.asarray(_savgol_or_original(values), dtype=np.float64)
+            self._buf = smooth.copy()
+            self._final = n - half if n > 50 else 0
+            return smooth
+
+        if n > self._buf.size:
+            grown = np.empty(max(n, 2 * self._buf.size))
+            grown[:self._final] = self._buf[:self._final]
+            self._buf = grown
+
+        coeffs, _, tail = _savgol_kernels(self.WINDOW, self.POLYORDER)
+        end = n - half
+        if end > self._final:
+            self._buf[self._final:end] = np.convolve(values[self._final - half:n], coeffs, mode="valid")
+        self._buf[end:n] = tail @ values[n - self.WINDOW:]
+        self._final = end
+        return self._buf[:n]
+
+
+def _update_angle_plot(ax, line_raw, line_smooth, times, xs, ys, pivot_x=None, pivot_y=None,
+                       x_smoother=None, y_smoother=None):
+    """
+    Actualiza la gráfica del ángulo del péndulo. Con x_smoother/y_smoother
+    (_TailSmoother) el suavizado de la trayectoria es incremental.
+    """
+    if len(xs) == 0:
         return
 
     px = pivot_x if pivot_x is not None else PIVOT_X
     py = pivot_y if pivot_y is not None else PIVOT_Y
 
-    arr_t = np.array(times)
-    arr_x = np.array(xs)
-    arr_y = np.array(ys)
+    arr_t = np.asarray(times)
+    arr_x = np.asarray(xs)
+    arr_y = np.asarray(ys)
 
-    x_smooth = _savgol_or_original(arr_x)
-    y_smooth = _savgol_or_original(arr_y)
+    x_smooth = x_smoother.update(arr_x) if x_smoother is not None else _savgol_or_original(arr_x)
+    y_smooth = y_smoother.update(arr_y) if y_smoother is not None else _savgol_or_original(arr_y)
 
     dx = x_smooth - px
     dy = y_smooth - py
@@ -69,98 +143,76 @@ def _update_angle_plot(ax, line_raw, line_smooth, times, xs, ys, pivot_x=None, p
     line_smooth.set_data(arr_t, theta_smooth)
     ax.relim()
     ax.autoscale_view()
-    plt.draw()
-    plt.pause(0.001)
-
-
-@dataclass
-class PendulumStats:
-    total_time: float
-    samples: int
-    oscillations: float
-    period: Optional[float]
-    frequency: Optional[float]
-    angular_frequency: Optional[float]
-    max_angle_deg: float
-    length_px: float
-    max_ang_velocity: float
-    max_ang_acceleration: float
-    pivot_x: float
-    pivot_y: float
-
-
-def _zero_crossings(times, signal):
-    """Devuelve los instantes donde la señal cruza por cero."""
-    crossings = []
-    for i in range(len(signal) - 1):
-        y1 = signal[i]
-        y2 = signal[i + 1]
-        if y1 == 0 and y2 == 0:
+    # redibujo diferido + procesar eventos de la ventana, sin la espera de plt.pause
+    canvas = ax.figure.canvas
+    canvas.draw_idle()
+    canvas.flush_events()
+
+
+def _scratch(buffers: dict, name: str, shape) -> np.ndarray:
+    """Buffer uint8 reutilizado entre frames para el dst= de OpenCV; solo se reasigna si cambia la forma."""
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, np.uint8)
+        buffers[name] = buf
+    return buf
+
+
+def _downscaled(buffers: dict, name: str, img: np.ndarray) -> np.ndarray:
+    """Reduce la imagen en DETECT_DOWNSCALE (promediando píxeles)."""
+    if DETECT_DOWNSCALE == 1:
+        return img
+    height, width = img.shape[:2]
+    shape = (height // DETECT_DOWNSCALE, width // DETECT_DOWNSCALE) + img.shape[2:]
+    return cv2.resize(img, (shape[1], shape[0]), dst=_scratch(buffers, name, shape), interpolation=cv2.INTER_AREA)
+
+
+def _put_until_stopped(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """put() bloqueante que se rinde si se pide parar (el consumidor ya no lee)."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
             continue
-        if y1 == 0:
-            crossings.append(float(times[i]))
+    return False
+
+
+def _reader_loop(cap, read_q: queue.Queue, stop: threading.Event):
+    """
+    Hilo lector: grab() de todos los frames y retrieve() de 1 de cada
+    PROCESS_EVERY_N; deja (frame_idx, frame) en read_q y None al terminar.
+    """
+    frame_idx = 0
+    while not stop.is_set():
+        if not cap.grab():
+            break
+        if frame_idx % PROCESS_EVERY_N:
+            frame_idx += 1
             continue
-        if y2 == 0:
-            crossings.append(float(times[i + 1]))
-            continue
-        if y1 * y2 < 0:
-            frac = -y1 / (y2 - y1)
-            if 0 <= frac <= 1:
-                t_cross = times[i] + frac * (times[i + 1] - times[i])
-                crossings.append(float(t_cross))
-    return crossings
-
-
-def _compute_physical_stats(times, xs, ys, pivot_x=None, pivot_y=None):
-    """Calcula periodo, frecuencia, amplitud angular, etc."""
-    if len(times) < 3:
-        return None
-
-    px = pivot_x if pivot_x is not None else PIVOT_X
-    py = pivot_y if pivot_y is not None else PIVOT_Y
-
-    arr_t = np.array(times)
-    arr_x = _savgol_or_original(xs)
-    arr_y = _savgol_or_original(ys)
-
-    dx = arr_x - px
-    dy = arr_y - py
-
-    theta = np.arctan2(dx, dy)
-    theta_centered = theta - np.mean(theta)
-    theta_deg = np.degrees(theta)
-
-    crossings = _zero_crossings(arr_t, theta_centered)
-    oscillations = len(crossings) / 2 if crossings else 0.0
-    half_periods = np.diff(crossings) if len(crossings) >= 2 else np.array([])
-
-    period = float(np.median(half_periods) * 2) if half_periods.size else None
-    frequency = (1.0 / period) if period and period > 0 else None
-    angular_frequency = (2 * np.pi / period) if period and period > 0 else None
-
-    total_time = float(arr_t[-1] - arr_t[0]) if len(arr_t) > 1 else 0.0
-    length_px = float(np.mean(np.sqrt(dx ** 2 + dy ** 2)))
-
-    theta_dot = np.gradient(theta, arr_t)
-    theta_ddot = np.gradient(theta_dot, arr_t)
-
-    max_ang_velocity = float(np.max(np.abs(theta_dot)))
-    max_ang_acceleration = float(np.max(np.abs(theta_ddot)))
-
-    return PendulumStats(
-        total_time=total_time,
-        samples=len(arr_t),
-        oscillations=oscillations,
-        period=period,
-        frequency=frequency,
-        angular_frequency=angular_frequency,
-        max_angle_deg=float(np.max(np.abs(theta_deg))),
-        length_px=length_px,
-        max_ang_velocity=max_ang_velocity,
-        max_ang_acceleration=max_ang_acceleration,
-        pivot_x=float(px),
-        pivot_y=float(py),
-    )
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        if not _put_until_stopped(read_q, (frame_idx, frame), stop):
+            return
+        frame_idx += 1
+    _put_until_stopped(read_q, None, stop)
+
+
+def _writer_loop(out, write_q: queue.Queue, failed: threading.Event, errors: list):
+    """
+    Hilo escritor: escribe en el video de salida cada frame que llega; None termina.
+    Si falla guarda la excepción en errors y marca failed (ya nadie vacía write_q).
+    """
+    try:
+        while True:
+            display = write_q.get()
+            if display is None:
+                break
+            out.write(display)
+    except Exception as exc:  # noqa: BLE001 - se relanza en el hilo principal
+        errors.append(exc)
+        failed.set()
 
 
 def _print_physical_stats(stats: PendulumStats):
@@ -182,272 +234,324 @@ def _print_physical_stats(stats: PendulumStats):
     print(f"  |θ''| máx           : {stats.max_ang_acceleration:.4f} rad/s²")
 
 
-cap = cv2.VideoCapture(VIDEO_PATH)
-if not cap.isOpened():
-    print("No se pudo abrir el video:", VIDEO_PATH)
-    exit()
-
-fps = cap.get(cv2.CAP_PROP_FPS)
-width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-print(f"FPS: {fps}, resolución: {width}x{height}")
-
-fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-out = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, fps, (width, height))
-
-csv_file = open(CSV_PATH, "w", newline="")
-csv_writer = csv.writer(csv_file)
-csv_writer.writerow(["frame", "tiempo_s", "x", "y", "radio"])
-
-ROI_TOP = int(height * 0.25)
-
-kernel = np.ones((5, 5), np.uint8)
-frame_idx = 0
-
-cv2.namedWindow("Analisis", cv2.WINDOW_NORMAL)
-
-# ==== Datos para la gráfica en vivo ====
-time_series = []
-x_series = []
-y_series = []
-
-plt.ion()
-fig, ax = plt.subplots(figsize=(6, 8))
-line_raw, = ax.plot([], [], ".", alpha=0.2, label="Ángulo crudo (ruido)")
-line_smooth, = ax.plot([], [], "-", linewidth=2, label="Ángulo suavizado (real)")
-ax.set_xlabel("Tiempo (s)")
-ax.set_ylabel("Ángulo θ (grados)")
-ax.set_title("Ángulo del péndulo vs tiempo (en tiempo real)")
-ax.grid(True)
-ax.legend()
-fig.tight_layout()
+def main():
+    """Procesa el video, guarda el CSV/video marcado y muestra la gráfica en vivo."""
+    cv2.setUseOptimized(True)  # rutas SIMD de OpenCV (activas por defecto salvo que se hayan desactivado)
+    cv2.setNumThreads(CV_NUM_THREADS)
 
-# ==== Variables para contar oscilaciones ====
-last_side    = 0
-sign_changes = 0
-oscillations = 0.0
-
-# ==== Centro dinámico basado en vértices + línea blanca ====
-center_x = None   # valor suavizado en X
-line_y   = None   # posición vertical de la línea blanca
-# ============================================
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    tiempo_s = frame_idx / fps
-    display = frame.copy()
-
-    # ================== 1) MITAD SUPERIOR (VÉRTICES + LÍNEA) ==================
-    top_roi = frame[0:height // 2, :]
-
-    hsv_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2HSV)
-    gray_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2GRAY)
-
-    # ---- Detectar vértices rojos ----
-    lower_red1 = np.array([0, 100, 80], dtype=np.uint8)
-    upper_red1 = np.array([10, 255, 255], dtype=np.uint8)
-    lower_red2 = np.array([170, 100, 80], dtype=np.uint8)
-    upper_red2 = np.array([180, 255, 255], dtype=np.uint8)
-
-    mask_red1 = cv2.inRange(hsv_top, lower_red1, upper_red1)
-    mask_red2 = cv2.inRange(hsv_top, lower_red2, upper_red2)
-    mask_red = cv2.bitwise_or(mask_red1, mask_red2)
-
-    mask_red = cv2.morphologyEx(mask_red, cv2.MORPH_OPEN, kernel, iterations=1)
-    mask_red = cv2.morphologyEx(mask_red, cv2.MORPH_CLOSE, kernel, iterations=1)
-
-    conts_center, _ = cv2.findContours(mask_red, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    puntos_vertices = []
-
-    for c in conts_center:
-        area = cv2.contourArea(c)
-        if area < 10:   # evita ruido muy pequeño, ajusta si hace falta
-            continue
-
-        M = cv2.moments(c)
-        if M["m00"] == 0:
-            continue
-
-        cx = int(M["m10"] / M["m00"])
-        cy = int(M["m01"] / M["m00"])
-
-        # Coordenadas globales
-        gx = cx
-        gy = cy  # entre 0 y height//2
-
-        puntos_vertices.append((gx, gy))
-
-    # ---- Detectar línea blanca horizontal ----
-    _, bin_white = cv2.threshold(gray_top, 200, 255, cv2.THRESH_BINARY)
-    bin_white = cv2.morphologyEx(bin_white, cv2.MORPH_OPEN, kernel, iterations=1)
-    bin_white = cv2.morphologyEx(bin_white, cv2.MORPH_CLOSE, kernel, iterations=1)
-
-    conts_white, _ = cv2.findContours(bin_white, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    candidate_line_y = None
-    max_width = 0
-
-    for c in conts_white:
-        xw, yw, ww, hw = cv2.boundingRect(c)
-        # filtro: línea más o menos horizontal y relativamente larga
-        if ww > max_width and ww > width * 0.4 and hw < 30:
-            max_width = ww
-            candidate_line_y = yw + hw // 2
-
-    if candidate_line_y is not None:
-        # actualizar y de la línea blanca (sin suavizado o con si quieres)
-        line_y = candidate_line_y
-
-        # Dibujar la línea detectada
-        cv2.line(display,
-                 (0, line_y),
-                 (width, line_y),
-                 (255, 255, 255), 2)
-        cv2.putText(display, "Linea blanca", (10, line_y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-    # ---- Calcular centro en X a partir de vértices ----
-    if len(puntos_vertices) >= 2:
-        # Ordenamos por x y tomamos el más izquierdo y el más derecho
-        puntos_vertices.sort(key=lambda p: p[0])
-        v_left = puntos_vertices[0]
-        v_right = puntos_vertices[-1]
+    cap = cv2.VideoCapture(VIDEO_PATH)
+    if not cap.isOpened():
+        print("No se pudo abrir el video:", VIDEO_PATH)
+        return
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # cámaras: no acumular frames viejos en el driver
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    print(f"FPS: {fps}, resolución: {width}x{height}")
+
+    fourcc = cv2.VideoWriter_fourcc(*OUTPUT_FOURCC)
+    out = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, fps / PROCESS_EVERY_N, (width, height))
+
+    csv_file = open(CSV_PATH, "w", newline="")
+    csv_writer = csv.writer(csv_file)
+    csv_writer.writerow(["frame", "tiempo_s", "x", "y", "radio"])
+    csv_rows = []
+
+    ROI_TOP = int(height * 0.25)
+
+    if SHOW_UI:
+        cv2.namedWindow("Analisis", cv2.WINDOW_NORMAL)
+
+    # ==== Datos para la gráfica en vivo ====
+    # arrays preasignados (uno por columna) con cursor n_samples; se duplican si
+    # el video trae más frames de los anunciados (o CAP_PROP_FRAME_COUNT no se conoce)
+    capacity = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // PROCESS_EVERY_N + 1, 1024)
+    t_arr = np.empty(capacity, dtype=np.float64)
+    x_arr = np.empty(capacity, dtype=np.int32)
+    y_arr = np.empty(capacity, dtype=np.int32)
+    n_samples = 0
+    x_smoother = _TailSmoother()
+    y_smoother = _TailSmoother()
+
+    if SHOW_UI:
+        plt.ion()
+        fig, ax = plt.subplots(figsize=(6, 8))
+        line_raw, = ax.plot([], [], ".", alpha=0.2, label="Ángulo crudo (ruido)")
+        line_smooth, = ax.plot([], [], "-", linewidth=2, label="Ángulo suavizado (real)")
+        ax.set_xlabel("Tiempo (s)")
+        ax.set_ylabel("Ángulo θ (grados)")
+        ax.set_title("Ángulo del péndulo vs tiempo (en tiempo real)")
+        ax.grid(True)
+        ax.legend()
+        fig.tight_layout()
+
+    # ==== Variables para contar oscilaciones ====
+    last_side    = 0
+    oscillations = 0.0   # medio ciclo por cada cambio de lado
+
+    # ==== Centro dinámico basado en vértices + línea blanca ====
+    center_x = None   # valor suavizado en X
+    line_y   = None   # posición vertical de la línea blanca
+    # ============================================
+
+    # Buffers intermedios (HSV, máscaras) reutilizados entre frames. Los de display
+    # (solo con DETECT_DOWNSCALE == 1) rotan: un frame puede seguir en write_q (o
+    # escribiéndose) mientras se dibuja el siguiente, así que hacen falta tantos
+    # como caben en vuelo + 2.
+    buffers = {}
+    display_slots = PIPELINE_QUEUE_SIZE + 2
+    display_slot = 0
+
+    # Decodificación y codificación en hilos propios: mientras se analiza el frame N
+    # se decodifica el N+1 y se escribe el N-1. CSV y matplotlib siguen en este hilo.
+    read_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    write_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    write_failed = threading.Event()
+    writer_errors = []
+    reader = threading.Thread(target=_reader_loop, args=(cap, read_q, stop), daemon=True)
+    writer = threading.Thread(target=_writer_loop, args=(out, write_q, write_failed, writer_errors), daemon=True)
+    reader.start()
+    writer.start()
+
+    while True:
+        item = read_q.get()
+        if item is None:
+            break
+        frame_idx, frame = item
+
+        tiempo_s = frame_idx / fps
+
+        # ================== 1) MITAD SUPERIOR (VÉRTICES + LÍNEA) ==================
+        top_roi = frame[0:height // 2, :]
+
+        # vértices y bola se buscan en la ROI reducida; la línea blanca es fina y
+        # se busca a resolución completa
+        small_top = _downscaled(buffers, "small_top", top_roi)
+        top_shape = small_top.shape[:2]
+        hsv_top = cv2.cvtColor(small_top, cv2.COLOR_BGR2HSV, dst=_scratch(buffers, "hsv_top", small_top.shape))
+        gray_top = cv2.cvtColor(top_roi, cv2.COLOR_BGR2GRAY, dst=_scratch(buffers, "gray_top", top_roi.shape[:2]))
+        roi = frame[ROI_TOP:, :]
+        small = _downscaled(buffers, "small_low", roi)
+
+        # A partir de aquí la detección solo lee small_top, gray_top y small, así que
+        # con DETECT_DOWNSCALE > 1 se dibuja sobre el propio frame (el lector entrega
+        # un array nuevo en cada retrieve()). A resolución completa small_top/small
+        # son vistas del frame y el overlay necesita su propia copia.
+        if DETECT_DOWNSCALE > 1:
+            display = frame
+        else:
+            display = _scratch(buffers, f"display{display_slot}", frame.shape)
+            display_slot = (display_slot + 1) % display_slots
+            np.copyto(display, frame)
+
+        # ---- Detectar vértices rojos ----
+        # El rojo da la vuelta en H (0-10 y 170-179): rotando el tono con una LUT
+        # ambos tramos quedan en 0-20 y basta un solo inRange.
+        hsv_top = cv2.LUT(hsv_top, _RED_HUE_LUT, dst=hsv_top)
+        mask_red = cv2.inRange(hsv_top, RED_LOWER, RED_UPPER, dst=_scratch(buffers, "mask_red", top_shape))
+
+        mask_tmp = cv2.morphologyEx(mask_red, cv2.MORPH_OPEN, MORPH_KERNEL, dst=_scratch(buffers, "mask_tmp", top_shape), iterations=1)
+        mask_red = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, MORPH_KERNEL, dst=mask_red, iterations=1)
+
+        # área y centroide de cada mancha roja en una sola pasada (etiqueta 0 = fondo)
+        _, _, blob_stats, centroids = cv2.connectedComponentsWithStats(mask_red, connectivity=8)
+        keep = blob_stats[1:, cv2.CC_STAT_AREA] >= 10 / DETECT_DOWNSCALE ** 2   # evita ruido muy pequeño
+        # coordenadas globales (y entre 0 y height//2)
+        puntos_vertices = [tuple(p) for p in _upscale(centroids[1:][keep]).astype(int).tolist()]
+
+        # ---- Detectar línea blanca horizontal ----
+        # Es una franja horizontal: basta contar píxeles blancos por fila (una
+        # pasada de cv2.reduce) en vez de morfología + contornos.
+        _, bin_white = cv2.threshold(gray_top, 200, 1, cv2.THRESH_BINARY, dst=gray_top)
+        row_counts = cv2.reduce(bin_white, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+
+        candidate_line_y = None
+        peak = int(np.argmax(row_counts))
+        if row_counts[peak] > width * 0.4:
+            # franja = filas contiguas al pico que también superan el umbral;
+            # filtro: línea más o menos horizontal (menos de 30 px de alto)
+            weak = np.flatnonzero(row_counts <= width * 0.4)
+            top = int(weak[weak < peak].max()) + 1 if np.any(weak < peak) else 0
+            bottom = int(weak[weak > peak].min()) if np.any(weak > peak) else row_counts.size
+            if bottom - top < 30:
+                candidate_line_y = top + (bottom - top) // 2
+
+        if candidate_line_y is not None:
+            # actualizar y de la línea blanca (sin suavizado o con si quieres)
+            line_y = candidate_line_y
+
+            # Dibujar la línea detectada
+            cv2.line(display,
+                     (0, line_y),
+                     (width, line_y),
+                     (255, 255, 255), 2)
+            cv2.putText(display, "Linea blanca", (10, line_y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+        # ---- Calcular centro en X a partir de vértices ----
+        if len(puntos_vertices) >= 2:
+            # Ordenamos por x y tomamos el más izquierdo y el más derecho
+            puntos_vertices.sort(key=lambda p: p[0])
+            v_left = puntos_vertices[0]
+            v_right = puntos_vertices[-1]
+
+            x_left, y_left = v_left
+            x_right, y_right = v_right
+
+            center_measured = (x_left + x_right) / 2.0
+
+            # Inicializar o suavizar centro X
+            if center_x is None:
+                center_x = center_measured
+            else:
+                center_x = CENTER_ALPHA * center_x + (1.0 - CENTER_ALPHA) * center_measured
+
+            # Dibujar todos los vértices detectados en rojo
+            for i, (vx, vy) in enumerate(puntos_vertices):
+                cv2.circle(display, (vx, vy), 6, (0, 0, 255), -1)
+                cv2.putText(display, f"V{i+1}", (vx + 5, vy - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+
+            # Marcar los dos vértices usados para el centro
+            cv2.circle(display, (x_left, y_left), 8, (0, 255, 0), 2)
+            cv2.circle(display, (x_right, y_right), 8, (0, 255, 0), 2)
+            cv2.line(display, (x_left, y_left), (x_right, y_right), (0, 255, 0), 2)
+
+        # ================== 2) DETECCIÓN DE LA BOLA NARANJA ==================
+        roi_shape = small.shape[:2]
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=_scratch(buffers, "hsv", small.shape))
+
+        mask = cv2.inRange(hsv, ORANGE_LOWER, ORANGE_UPPER, dst=_scratch(buffers, "mask", roi_shape))
+        mask_tmp = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL, dst=_scratch(buffers, "mask_roi_tmp", roi_shape), iterations=1)
+        mask = cv2.morphologyEx(mask_tmp, cv2.MORPH_CLOSE, MORPH_KERNEL, dst=mask, iterations=2)
+
+        # la bola es la mancha de mayor área: área, caja y centroide en una sola pasada
+        n_blobs, _, blob_stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        if n_blobs > 1 and center_x is not None:
+            i = 1 + int(np.argmax(blob_stats[1:, cv2.CC_STAT_AREA]))  # etiqueta 0 = fondo
+            if blob_stats[i, cv2.CC_STAT_AREA] > MIN_CONTOUR_AREA / DETECT_DOWNSCALE ** 2:
+                x_roi, y_roi = centroids[i]
+                x = int(_upscale(x_roi))
+                y = int(_upscale(y_roi) + ROI_TOP)
+                # radio = media caja (en píxeles de la imagen reducida)
+                r = int(max(blob_stats[i, cv2.CC_STAT_WIDTH], blob_stats[i, cv2.CC_STAT_HEIGHT]) * DETECT_DOWNSCALE / 2)
+
+                # ---- GUARDAR EN CSV ----
+                csv_rows.append((frame_idx, tiempo_s, x, y, r))
+                if len(csv_rows) >= CSV_FLUSH_EVERY:
+                    csv_writer.writerows(csv_rows)
+                    csv_rows.clear()
+
+                # ---- CONTAR OSCILACIONES USANDO CENTRO DINÁMICO EN X ----
+                dx = x - center_x
+                side = (dx > DEAD_ZONE) - (dx < -DEAD_ZONE)   # -1, 0 (zona muerta) o 1
+
+                if side * last_side < 0:
+                    oscillations += 0.5
+
+                if side:
+                    last_side = side
+
+                # ---- DIBUJAR BOLA ----
+                cv2.circle(display, (x, y), r, (0, 165, 255), 3)
+                cv2.circle(display, (x, y), 3, (0, 255, 0), -1)
+
+                x1, y1 = max(0, x - r), max(ROI_TOP, y - r)
+                x2, y2 = min(width, x + r), min(height, y + r)
+                cv2.rectangle(display, (x1, y1), (x2, y2), (0, 200, 255), 2)
+
+                # ---- Actualizar gráfica del ángulo ----
+                if n_samples == t_arr.size:
+                    t_arr = np.resize(t_arr, 2 * t_arr.size)
+                    x_arr = np.resize(x_arr, 2 * x_arr.size)
+                    y_arr = np.resize(y_arr, 2 * y_arr.size)
+                t_arr[n_samples] = tiempo_s
+                x_arr[n_samples] = x
+                y_arr[n_samples] = y
+                n_samples += 1
+                if SHOW_UI and n_samples % PLOT_EVERY == 0:
+                    _update_angle_plot(
+                        ax,
+                        line_raw,
+                        line_smooth,
+                        t_arr[:n_samples],
+                        x_arr[:n_samples],
+                        y_arr[:n_samples],
+                        pivot_x=center_x,
+                        pivot_y=line_y,
+                        x_smoother=x_smoother,
+                        y_smoother=y_smoother,
+                    )
+
+        # ================== 3) MARCAR EL CENTRO ACTUAL ==================
+        center_x_int = int(center_x) if center_x is not None else width // 2 
+        center_y_int = int(line_y) if line_y is not None else height // 2
+
+        cv2.line(display, (center_x_int, 0), (center_x_int, height), (0, 0, 255), 2)
+        cv2.circle(display, (center_x_int, center_y_int), 8, (0, 255, 255), -1)
+        cv2.putText(display, "Centro", (center_x_int + 10, center_y_int),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+
+        # ---- Texto en pantalla ----
+        cv2.putText(display, f"Tiempo: {tiempo_s:.2f} s", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.1, (255, 255, 0), 3)
+
+        #cv2.putText(display, f"Oscilaciones: {int(oscillations)}", (20, 80), MOSTRAR OSCILACIONES EN PANTALLA
+        #            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 255), 2)
+
+        # Línea mostrando inicio de la ROI inferior
+        cv2.line(display, (0, ROI_TOP), (width, ROI_TOP), (255, 0, 0), 2)
+
+        if not _put_until_stopped(write_q, display, write_failed):
+            break  # el hilo escritor murió: se relanza su excepción al final
+
+        if SHOW_UI:
+            cv2.imshow("Analisis", display)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+
+    stop.set()
+    reader.join()
+    _put_until_stopped(write_q, None, write_failed)
+    writer.join()
+
+    cap.release()
+    out.release()
+    csv_writer.writerows(csv_rows)
+    csv_file.close()
+    if writer_errors:
+        raise writer_errors[0]
+    if SHOW_UI:
+        cv2.destroyAllWindows()
+        _update_angle_plot(ax, line_raw, line_smooth, t_arr[:n_samples], x_arr[:n_samples], y_arr[:n_samples],
+                           pivot_x=center_x, pivot_y=line_y, x_smoother=x_smoother, y_smoother=y_smoother)
+        plt.ioff()
+        plt.show()
+
+    pivot_x_for_stats = center_x if center_x is not None else PIVOT_X
+    pivot_y_for_stats = line_y if line_y is not None else PIVOT_Y
+
+    stats = _compute_physical_stats(
+        t_arr[:n_samples],
+        x_arr[:n_samples],
+        y_arr[:n_samples],
+        pivot_x=pivot_x_for_stats,
+        pivot_y=pivot_y_for_stats,
+    )
+    if stats:
+        _print_physical_stats(stats)
+    else:
+        print("\n[OPERACION] No hay suficientes datos para estimar las magnitudes físicas.")
 
-        x_left, y_left = v_left
-        x_right, y_right = v_right
+    print("\n[RESULTADOS] Listo")
+    print("[RESULTADOS] Video marcado:", OUTPUT_VIDEO)
+    print("[RESULTADOS] Datos guardados en:", CSV_PATH)
+    #print(f"[RESULTADOS] Oscilaciones detectadas: {int(oscillations)}")
 
-        center_measured = (x_left + x_right) / 2.0
 
-        # Inicializar o suavizar centro X
-        if center_x is None:
-            center_x = center_measured
-        else:
-            center_x = CENTER_ALPHA * center_x + (1.0 - CENTER_ALPHA) * center_measured
-
-        # Dibujar todos los vértices detectados en rojo
-        for i, (vx, vy) in enumerate(puntos_vertices):
-            cv2.circle(display, (vx, vy), 6, (0, 0, 255), -1)
-            cv2.putText(display, f"V{i+1}", (vx + 5, vy - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-
-        # Marcar los dos vértices usados para el centro
-        cv2.circle(display, (x_left, y_left), 8, (0, 255, 0), 2)
-        cv2.circle(display, (x_right, y_right), 8, (0, 255, 0), 2)
-        cv2.line(display, (x_left, y_left), (x_right, y_right), (0, 255, 0), 2)
-
-    # ================== 2) DETECCIÓN DE LA BOLA NARANJA ==================
-    roi = frame[ROI_TOP:, :]
-    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-
-    mask = cv2.inRange(hsv, ORANGE_LOWER, ORANGE_UPPER)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    if contours and center_x is not None:
-        c = max(contours, key=cv2.contourArea)
-        if cv2.contourArea(c) > MIN_CONTOUR_AREA:
-            (x_roi, y_roi), radius = cv2.minEnclosingCircle(c)
-            x = int(x_roi)
-            y = int(y_roi + ROI_TOP)
-            r = int(radius)
-
-            # ---- GUARDAR EN CSV ----
-            csv_writer.writerow([frame_idx, tiempo_s, x, y, r])
-
-            # ---- CONTAR OSCILACIONES USANDO CENTRO DINÁMICO EN X ----
-            dx = x - center_x
-            if abs(dx) <= DEAD_ZONE:
-                side = 0
-            else:
-                side = 1 if dx > 0 else -1
-
-            if last_side != 0 and side != 0 and side != last_side:
-                sign_changes += 1
-                oscillations = sign_changes // 2
-
-            if side != 0:
-                last_side = side
-
-            # ---- DIBUJAR BOLA ----
-            cv2.circle(display, (x, y), r, (0, 165, 255), 3)
-            cv2.circle(display, (x, y), 3, (0, 255, 0), -1)
-
-            x1, y1 = max(0, x - r), max(ROI_TOP, y - r)
-            x2, y2 = min(width, x + r), min(height, y + r)
-            cv2.rectangle(display, (x1, y1), (x2, y2), (0, 200, 255), 2)
-
-            # ---- Actualizar gráfica del ángulo ----
-            time_series.append(tiempo_s)
-            x_series.append(x)
-            y_series.append(y)
-            _update_angle_plot(
-                ax,
-                line_raw,
-                line_smooth,
-                time_series,
-                x_series,
-                y_series,
-                pivot_x=center_x,
-                pivot_y=line_y,
-            )
-
-    # ================== 3) MARCAR EL CENTRO ACTUAL ==================
-    center_x_int = int(center_x) if center_x is not None else width // 2 
-    center_y_int = int(line_y) if line_y is not None else height // 2
-
-    cv2.line(display, (center_x_int, 0), (center_x_int, height), (0, 0, 255), 2)
-    cv2.circle(display, (center_x_int, center_y_int), 8, (0, 255, 255), -1)
-    cv2.putText(display, "Centro", (center_x_int + 10, center_y_int),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-    # ---- Texto en pantalla ----
-    cv2.putText(display, f"Tiempo: {tiempo_s:.2f} s", (20, 40),
-                cv2.FONT_HERSHEY_SIMPLEX, 1.1, (255, 255, 0), 3)
-
-    #cv2.putText(display, f"Oscilaciones: {int(oscillations)}", (20, 80), MOSTRAR OSCILACIONES EN PANTALLA
-    #            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 255), 2)
-
-    # Línea mostrando inicio de la ROI inferior
-    cv2.line(display, (0, ROI_TOP), (width, ROI_TOP), (255, 0, 0), 2)
-
-    cv2.imshow("Analisis", display)
-    out.write(display)
-
-    if cv2.waitKey(1) & 0xFF == ord("q"):
-        break
-
-    frame_idx += 1
-
-cap.release()
-out.release()
-csv_file.close()
-cv2.destroyAllWindows()
-plt.ioff()
-plt.show()
-
-pivot_x_for_stats = center_x if center_x is not None else PIVOT_X
-pivot_y_for_stats = line_y if line_y is not None else PIVOT_Y
-
-stats = _compute_physical_stats(
-    time_series,
-    x_series,
-    y_series,
-    pivot_x=pivot_x_for_stats,
-    pivot_y=pivot_y_for_stats,
-)
-if stats:
-    _print_physical_stats(stats)
-else:
-    print("\n[OPERACION] No hay suficientes datos para estimar las magnitudes físicas.")
-
-print("\n[RESULTADOS] Listo")
-print("[RESULTADOS] Video marcado:", OUTPUT_VIDEO)
-print("[RESULTADOS] Datos guardados en:", CSV_PATH)
-#print(f"[RESULTADOS] Oscilaciones detectadas: {int(oscillations)}")
+if __name__ == "__main__":
+    main()
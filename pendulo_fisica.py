@@ -6,11 +6,11 @@ y entrega un resumen con periodo, frecuencia, amplitud angular, etc.
 """
 
 import argparse
+import warnings
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import numpy as np
-import pandas as pd
 from scipy.signal import savgol_filter
 
 
@@ -51,36 +51,60 @@ def _savgol(values: np.ndarray, window: Optional[int], polyorder: int = 3) -> np
 
 
 def _zero_crossings(times: np.ndarray, signal: np.ndarray) -> List[float]:
-    crossings: List[float] = []
-    for i in range(len(signal) - 1):
-        y1, y2 = signal[i], signal[i + 1]
-        if y1 == 0 and y2 == 0:
-            continue
-        if y1 == 0:
-            crossings.append(float(times[i]))
-            continue
-        if y2 == 0:
-            crossings.append(float(times[i + 1]))
-            continue
-        if y1 * y2 < 0:
-            frac = -y1 / (y2 - y1)
-            if 0 <= frac <= 1:
-                t_cross = times[i] + frac * (times[i + 1] - times[i])
-                crossings.append(t_cross)
-    return crossings
-
-
-def _prepare_angles(df: pd.DataFrame, pivot_x: float, pivot_y: float,
+    # mismo detector que backend/pendulum_processor.py; copiado para no importar
+    # el backend (cv2, matplotlib, Numba) desde este script
+    t = np.asarray(times, dtype=np.float64)
+    y = np.asarray(signal, dtype=np.float64)
+    if y.size < 2:
+        return []
+
+    y1 = y[:-1]
+    y2 = y[1:]
+    z1 = y1 == 0
+    z2 = y2 == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = -y1 / (y2 - y1)
+    sign_change = (y1 * y2 < 0) & (frac >= 0) & (frac <= 1)
+
+    # como mucho un cruce por intervalo: muestra exacta en cero o interpolación lineal
+    t_cross = np.where(z1, t[:-1], np.where(z2, t[1:], t[:-1] + frac * np.diff(t)))
+    mask = (z1 != z2) | sign_change
+    return t_cross[mask].tolist()
+
+
+def _load_csv(csv_path: str) -> Dict[str, np.ndarray]:
+    # CSV numérico con cabecera (frame,tiempo_s,x,y,radio): columnas por nombre,
+    # ordenadas por tiempo
+    with open(csv_path, newline="") as f:
+        header = f.readline().strip().split(",")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "input contained no data": se trata abajo
+            data = np.loadtxt(f, delimiter=",", ndmin=2)
+    if data.size == 0:
+        raise ValueError("El CSV no contiene datos.")
+
+    columns = dict(zip(header, data.T))
+    t = columns["tiempo_s"]
+    if np.any(t[1:] < t[:-1]):  # main.py ya lo escribe en orden: solo se ordena si hace falta
+        order = np.argsort(t, kind="stable")
+        columns = {name: col[order] for name, col in columns.items()}
+    return columns
+
+
+def _prepare_angles(x: np.ndarray, y: np.ndarray, pivot_x: float, pivot_y: float,
                     window: Optional[int]) -> np.ndarray:
-    x = df["x"].to_numpy()
-    y = df["y"].to_numpy()
+    # copias propias en float64: _savgol puede devolver la misma serie y abajo
+    # se trabaja in-place
+    x = np.array(x, dtype=np.float64)
+    y = np.array(y, dtype=np.float64)
 
     x_smooth = _savgol(x, window)
     y_smooth = _savgol(y, window)
 
-    dx = x_smooth - pivot_x
-    dy = y_smooth - pivot_y
-    theta = np.arctan2(dx, dy)
+    # dx, dy y θ sobre los mismos buffers, sin temporales
+    np.subtract(x_smooth, pivot_x, out=x_smooth)
+    np.subtract(y_smooth, pivot_y, out=y_smooth)
+    theta = np.arctan2(x_smooth, y_smooth, out=x_smooth)
 
     return _savgol(theta, window)
 
@@ -91,12 +115,11 @@ def compute_stats(csv_path: str,
                   window: Optional[int],
                   pixels_per_meter: Optional[float],
                   known_length_m: Optional[float]) -> PendulumStats:
-    df = pd.read_csv(csv_path).sort_values("tiempo_s")
-    if df.empty:
-        raise ValueError("El CSV no contiene datos.")
-
-    t = df["tiempo_s"].to_numpy()
-    theta = _prepare_angles(df, pivot_x, pivot_y, window)
+    columns = _load_csv(csv_path)
+    t = columns["tiempo_s"]
+    x = columns["x"]
+    y = columns["y"]
+    theta = _prepare_angles(x, y, pivot_x, pivot_y, window)
     theta_centered = theta - np.mean(theta)
     theta_deg = np.degrees(theta)
 
@@ -110,8 +133,7 @@ def compute_stats(csv_path: str,
 
     total_time = float(t[-1] - t[0])
 
-    dr = np.sqrt((df["x"] - pivot_x) ** 2 + (df["y"] - pivot_y) ** 2)
-    length_px = float(dr.mean())
+    length_px = float(np.mean(np.hypot(x - pivot_x, y - pivot_y)))
 
     length_m = None
     if known_length_m:
@@ -123,7 +145,6 @@ def compute_stats(csv_path: str,
     if period and length_m:
         g_estimate = 4 * np.pi ** 2 * length_m / (period ** 2)
 
-    dt = np.gradient(t)
     theta_dot = np.gradient(theta, t)
     theta_ddot = np.gradient(theta_dot, t)
     max_ang_velocity = float(np.max(np.abs(theta_dot)))
@@ -137,7 +158,7 @@ def compute_stats(csv_path: str,
 
     return PendulumStats(
         total_time=total_time,
-        samples=len(df),
+        samples=len(t),
         oscillations=oscillations,
         period=period,
         frequency=frequency,
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Los módulos del backend se importan entre sí sin prefijo de paquete
+# (from pendulum_processor import ...), igual que al lanzar backend/app.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def synthetic_frame():
+    """
+    Devuelve frame(t, ball_x=None): 640x480 con dos vértices rojos (centro en
+    x=320), la línea blanca y la bola naranja (por defecto oscilando con T=1.5 s).
+    """
+    def frame(t: float, ball_x=None) -> np.ndarray:
+        img = np.zeros((480, 640, 3), np.uint8)
+        cv2.circle(img, (200, 60), 8, (0, 0, 255), -1)
+        cv2.circle(img, (440, 60), 8, (0, 0, 255), -1)
+        cv2.rectangle(img, (50, 100), (600, 104), (255, 255, 255), -1)
+        if ball_x is None:
+            ball_x = int(320 + 120 * np.sin(2 * np.pi * t / 1.5))
+        cv2.circle(img, (ball_x, 350), 20, (0, 128, 255), -1)
+        return img
+
+    return frame
@@ -0,0 +1,175 @@
+import base64
+import json
+import threading
+import time
+
+import cv2
+import pytest
+import simple_websocket
+from werkzeug.serving import make_server
+
+import app as appmod
+
+
+def test_segment_writer_rejects_rows_after_close(tmp_path):
+    path = tmp_path / "sesion.csv"
+    writer = appmod.SegmentWriter(str(path), ["frame", "tiempo_s", "x", "y", "radio"])
+    writer.writerow([0, 0.0, 1, 2, 3])
+    writer.close()
+
+    assert writer.closed
+    with pytest.raises(ValueError):
+        writer.writerow([1, 0.1, 1, 2, 3])
+    assert path.read_bytes() == b"frame,tiempo_s,x,y,radio\r\n0,0.0,1,2,3\r\n"
+
+
+def _send_frame(ws, session_id: str, t: float, synthetic_frame) -> None:
+    """Envía un frame JSON por /stream y espera la respuesta."""
+    _, jpeg = cv2.imencode(".jpg", synthetic_frame(t))
+    ws.send(json.dumps({
+        "frame": base64.b64encode(jpeg.tobytes()).decode("ascii"),
+        "fps": 30,
+        "timestamp": t,
+        "session_id": session_id,
+    }))
+    assert ws.receive(timeout=5) is not None
+
+
+def _stream_frames(port: int, session_id: str, times, synthetic_frame) -> None:
+    """Una conexión a /stream que envía un frame por vez (esperando la respuesta) y cierra."""
+    ws = simple_websocket.Client.connect(f"ws://127.0.0.1:{port}/stream")
+    try:
+        for t in times:
+            _send_frame(ws, session_id, t, synthetic_frame)
+    finally:
+        ws.close()
+
+
+def _wait_closed(session_id: str, timeout: float = 5.0) -> None:
+    """Espera a que el servidor cierre el CSV de la sesión tras la desconexión."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        csv_writer = appmod.session_csv_writers.get(session_id)
+        if csv_writer is not None and csv_writer.closed:
+            return
+        time.sleep(0.02)
+    raise AssertionError("el CSV de la sesión no se cerró al desconectar")
+
+
+def test_stream_reconnect_keeps_writing_session_csv(tmp_path, monkeypatch, synthetic_frame):
+    monkeypatch.setattr(appmod, "_CSV_DIR", str(tmp_path))
+    session_id = "reconexion"
+    server = make_server("127.0.0.1", 0, appmod.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        _stream_frames(server.server_port, session_id, [0.0, 1 / 30, 2 / 30], synthetic_frame)
+        _wait_closed(session_id)
+        _stream_frames(server.server_port, session_id, [3 / 30, 4 / 30], synthetic_frame)
+        _wait_closed(session_id)
+        # al desconectar el recuento de oscilaciones incluye el último lote parcial
+        session_proc = appmod.session_store[session_id]
+        assert session_proc._sides_counted == session_proc._n == 5
+    finally:
+        server.shutdown()
+        appmod.session_store.pop(session_id, None)
+        appmod.session_csv_writers.pop(session_id, None)
+
+    lines = (tmp_path / f"datos_pendulo_{session_id}.csv").read_bytes().split(b"\r\n")
+    assert lines[0] == b"frame,tiempo_s,x,y,radio"
+    assert [line.split(b",")[0] for line in lines[1:-1]] == [b"0", b"1", b"2", b"3", b"4"]
+    assert lines[-1] == b""
+
+
+@pytest.mark.parametrize("headers", [{}, {"Origin": ""}], ids=["missing", "empty"])
+def test_cors_without_origin_allows_any(headers):
+    response = appmod.app.test_client().options("/analysis/plot", headers=headers)
+    assert response.headers["Access-Control-Allow-Origin"] == "*"
+
+
+def test_cors_echoes_origin():
+    response = appmod.app.test_client().options("/analysis/plot", headers={"Origin": "https://ejemplo.local"})
+    assert response.headers["Access-Control-Allow-Origin"] == "https://ejemplo.local"
+
+
+def test_open_stream_session_survives_lru_eviction(tmp_path, monkeypatch, synthetic_frame):
+    monkeypatch.setattr(appmod, "_CSV_DIR", str(tmp_path))
+    monkeypatch.setattr(appmod, "session_store", appmod.SessionCache(1, 3600.0))
+    monkeypatch.setattr(
+        appmod, "session_csv_writers", appmod.SessionCache(1, 3600.0, on_evict=lambda _sid, w: w.close())
+    )
+    session_id = "abierta"
+    server = make_server("127.0.0.1", 0, appmod.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        ws = simple_websocket.Client.connect(f"ws://127.0.0.1:{server.server_port}/stream")
+        try:
+            _send_frame(ws, session_id, 0.0, synthetic_frame)
+            # otra sesión llena las cachés (maxsize=1) con la conexión aún abierta
+            appmod.session_store["otra"] = appmod.PendulumProcessor()
+            appmod.session_csv_writers["otra"] = appmod.SegmentWriter(str(tmp_path / "otra.csv"), ["frame"])
+            _send_frame(ws, session_id, 1 / 30, synthetic_frame)
+            _send_frame(ws, session_id, 2 / 30, synthetic_frame)
+        finally:
+            ws.close()
+        _wait_closed(session_id)
+    finally:
+        server.shutdown()
+        appmod.session_csv_writers["otra"].close()
+
+    lines = (tmp_path / f"datos_pendulo_{session_id}.csv").read_bytes().split(b"\r\n")
+    assert [line.split(b",")[0] for line in lines[1:-1]] == [b"0", b"1", b"2"]
+
+
+def test_session_cache_evicts_least_recently_used():
+    evicted = []
+    cache = appmod.SessionCache(2, 3600.0, on_evict=lambda key, value: evicted.append((key, value)))
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1  # "a" pasa a ser la más reciente
+    cache["c"] = 3
+    assert evicted == [("b", 2)]
+    assert list(cache) == ["a", "c"]
+
+
+def test_session_cache_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(appmod.time, "monotonic", lambda: now[0])
+    evicted = []
+    cache = appmod.SessionCache(10, 60.0, on_evict=lambda key, value: evicted.append(key))
+    cache["a"] = 1
+    cache["b"] = 2
+    now[0] += 40
+    assert cache["a"] == 1  # el acceso renueva el TTL de "a"
+    now[0] += 30
+    assert cache.get("b") is None
+    assert cache["a"] == 1
+    assert evicted == ["b"]
+
+
+def test_session_cache_closes_csv_writer_on_eviction(tmp_path):
+    cache = appmod.SessionCache(1, 3600.0, on_evict=lambda _sid, csv_writer: csv_writer.close())
+    first = appmod.SegmentWriter(str(tmp_path / "a.csv"), ["frame"])
+    first.writerow([0])
+    cache["a"] = first
+    cache["b"] = appmod.SegmentWriter(str(tmp_path / "b.csv"), ["frame"])
+    assert first.closed
+    assert (tmp_path / "a.csv").read_bytes() == b"frame\r\n0\r\n"  # lo pendiente se vuelca al cerrar
+    cache["b"].close()
+
+
+def test_session_cache_keeps_pinned_keys(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(appmod.time, "monotonic", lambda: now[0])
+    evicted = []
+    cache = appmod.SessionCache(1, 60.0, on_evict=lambda key, value: evicted.append(key))
+    cache.pin("a")
+    cache["a"] = 1
+    cache["b"] = 2  # excede maxsize, pero "a" está fijada y "b" es la nueva
+    assert len(cache) == 2 and evicted == []
+    now[0] += 120
+    assert cache.values() == [1]  # "a" se renueva en lugar de caducar
+    assert evicted == ["b"]
+    cache.unpin("a")
+    now[0] += 120
+    assert cache.values() == []
+    assert evicted == ["b", "a"]
@@ -0,0 +1,61 @@
+import threading
+
+import cv2
+import numpy as np
+
+import main
+
+
+class _FailingVideoWriter:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def write(self, frame):
+        raise OSError("disco lleno")
+
+    def release(self):
+        pass
+
+
+def test_main_reraises_writer_error_instead_of_hanging(tmp_path, monkeypatch, synthetic_frame):
+    video = tmp_path / "entrada.avi"
+    out = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*"MJPG"), 30, (640, 480))
+    for i in range(3 * main.PIPELINE_QUEUE_SIZE + 10):  # más frames de los que caben en las colas
+        out.write(synthetic_frame(i / 30))
+    out.release()
+
+    monkeypatch.setattr(main, "SHOW_UI", False)
+    monkeypatch.setattr(main, "VIDEO_PATH", str(video))
+    monkeypatch.setattr(main, "CSV_PATH", str(tmp_path / "datos.csv"))
+    monkeypatch.setattr(main.cv2, "VideoWriter", _FailingVideoWriter)
+
+    errors = []
+
+    def run():
+        try:
+            main.main()
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "main() se quedó bloqueado en write_q"
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
+
+
+def test_tail_smoother_matches_full_savgol_filter_as_the_series_grows():
+    from scipy.signal import savgol_filter
+
+    rng = np.random.default_rng(0)
+    values = 300 + 80 * np.sin(np.arange(400) * 0.2) + rng.normal(0, 2, 400)
+    smoother = main._TailSmoother()
+    n = 1
+    while n <= values.size:
+        smooth = smoother.update(values[:n])
+        window = 41 if n > 50 else 9
+        if window >= n:
+            window = n if n % 2 == 1 else n - 1
+        expected = savgol_filter(values[:n], window, 3) if window >= 5 else values[:n]
+        np.testing.assert_allclose(smooth, expected, rtol=0, atol=1e-9)
+        n += 1 if n < 60 else int(rng.integers(1, 4))  # a veces llegan varias muestras juntas
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import warnings
+
+import numpy as np
+
+import pendulo_fisica
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_compute_stats_with_duplicate_timestamps(tmp_path):
+    times = [0.0, 0.1, 0.1, 0.2, 0.3, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+    xs = [300, 310, 320, 330, 320, 310, 300, 290, 300, 310, 320, 330]
+    path = tmp_path / "datos.csv"
+    path.write_text(
+        "frame,tiempo_s,x,y,radio\r\n"
+        + "".join(f"{i},{t!r},{x},400,20\r\n" for i, (t, x) in enumerate(zip(times, xs)))
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = pendulo_fisica.compute_stats(str(path), 320.0, 100.0, None, None, None)
+        theta = pendulo_fisica._prepare_angles(np.array(xs), np.full(len(xs), 400), 320.0, 100.0, None)
+        theta_dot = np.gradient(theta, np.array(times))
+        theta_ddot = np.gradient(theta_dot, np.array(times))
+
+    assert stats.samples == len(times)
+    np.testing.assert_equal(stats.max_ang_velocity, np.max(np.abs(theta_dot)))
+    np.testing.assert_equal(stats.max_ang_acceleration, np.max(np.abs(theta_ddot)))
+
+
+def test_zero_crossings_matches_backend():
+    import pendulum_processor
+
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.uniform(0.01, 0.05, 200))
+    signal = np.round(np.sin(times * 7.0) + rng.normal(0, 0.05, times.size), 1)  # con ceros exactos
+    assert pendulo_fisica._zero_crossings(times, signal) == pendulum_processor._zero_crossings(times, signal)
+
+
+def test_cli_does_not_import_backend():
+    code = "import sys, pendulo_fisica; print('cv2' in sys.modules, 'backend' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
@@ -0,0 +1,211 @@
+import base64
+import json
+import struct
+import warnings
+
+import cv2
+import numpy as np
+import pytest
+
+import pendulum_processor as pp
+
+# Tiempos con duplicados (timestamps del cliente o frames repetidos)
+DUP_TIMES = np.array([0.0, 0.1, 0.1, 0.2, 0.3, 0.3, 0.4, 0.5, 0.6, 0.7])
+DUP_XS = np.array([300.0, 310.0, 320.0, 330.0, 320.0, 310.0, 300.0, 290.0, 300.0, 310.0])
+DUP_YS = np.full(DUP_TIMES.size, 400.0)
+
+STATS_PATHS = [
+    pytest.param(pp._stats_kernel, id="kernel"),  # compilado con Numba si está instalado
+    pytest.param(pp._stats_loop, id="loop"),
+    pytest.param(pp._stats_numpy, id="numpy"),
+]
+
+
+@pytest.mark.parametrize("stats_fn", STATS_PATHS)
+def test_stats_with_duplicate_timestamps_match_numpy_gradient(stats_fn):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        theta, theta_mean, max_abs_theta, length_px, max_dot, max_ddot = stats_fn(
+            DUP_TIMES, DUP_XS, DUP_YS, 320.0, 100.0
+        )
+        expected_theta = np.arctan2(DUP_XS - 320.0, DUP_YS - 100.0)
+        expected_dot = np.gradient(expected_theta, DUP_TIMES)
+        expected_ddot = np.gradient(expected_dot, DUP_TIMES)
+
+    np.testing.assert_allclose(theta, expected_theta)
+    assert theta_mean == pytest.approx(expected_theta.mean())
+    assert max_abs_theta == pytest.approx(np.abs(expected_theta).max())
+    assert length_px == pytest.approx(np.hypot(DUP_XS - 320.0, DUP_YS - 100.0).mean())
+    np.testing.assert_equal(max_dot, np.max(np.abs(expected_dot)))
+    np.testing.assert_equal(max_ddot, np.max(np.abs(expected_ddot)))
+
+
+def test_compute_physical_stats_accepts_duplicate_timestamps():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = pp._compute_physical_stats(list(DUP_TIMES), list(DUP_XS), list(DUP_YS), pivot_x=320, pivot_y=100)
+    assert stats is not None
+    assert stats.samples == DUP_TIMES.size
+
+
+def test_analysis_plot_endpoint_with_duplicate_timestamps():
+    import app as appmod
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        response = appmod.app.test_client().post(
+            "/analysis/plot",
+            json={"times": DUP_TIMES.tolist(), "xs": DUP_XS.tolist(), "ys": DUP_YS.tolist(), "pivot_x": 320, "pivot_y": 100},
+        )
+    assert response.status_code == 200
+
+
+def test_oscillation_count_includes_last_partial_batch(synthetic_frame):
+    processor = pp.PendulumProcessor(fps=30)
+    n_frames = 2 * pp.OSCILLATION_RECOUNT_EVERY - 7  # no múltiplo del lote
+    for i in range(n_frames):
+        # la bola cambia de lado en cada frame: un cambio de lado por muestra
+        processor.process_frame(synthetic_frame(i / 30, ball_x=200 if i % 2 else 440))
+    assert processor._n == n_frames
+
+    processor.get_stats()
+    assert processor.oscillations == (n_frames - 1) // 2
+
+
+@pytest.mark.parametrize(
+    "gradient_fn",
+    [
+        pytest.param(pp._gradient_kernel, id="kernel"),
+        pytest.param(pp._gradient_loop, id="loop"),
+        pytest.param(pp._gradient_numpy, id="numpy"),
+    ],
+)
+def test_gradient_with_duplicate_timestamps_matches_numpy(gradient_fn):
+    f = np.sin(np.arange(DUP_TIMES.size, dtype=np.float64))
+    out = np.empty_like(f)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        gradient_fn(f, DUP_TIMES, out)
+        expected = np.gradient(f, DUP_TIMES)
+    np.testing.assert_array_equal(np.isnan(out), np.isnan(expected))
+    finite = np.isfinite(expected)
+    np.testing.assert_allclose(out[finite], expected[finite])
+    np.testing.assert_array_equal(out[~finite], expected[~finite])
+
+
+@pytest.mark.skipif(pp.numba is None, reason="sin Numba no hay nada que compilar")
+def test_warm_up_compiles_kernels_for_float64_series():
+    pp.warm_up_kernels()
+    float64_1d = pp.numba.types.float64[::1]
+    assert (float64_1d, float64_1d, float64_1d, pp.numba.types.float64, pp.numba.types.float64) in pp._stats_kernel.signatures
+    assert pp._gradient_kernel.signatures
+
+
+@pytest.mark.parametrize("downscale", [1, 2, 4])
+def test_ball_radius_is_scaled_as_a_length(monkeypatch, synthetic_frame, downscale):
+    monkeypatch.setattr(pp, "DETECT_DOWNSCALE", downscale)
+    processor = pp.PendulumProcessor(fps=30)
+    processor.process_frame(synthetic_frame(0.0, ball_x=300))  # fija center_x
+    _, info = processor.process_frame(synthetic_frame(0.0, ball_x=300))
+    assert info["radius"] == 20  # radio de la bola en synthetic_frame
+
+
+def _zero_crossings_reference(times, signal):
+    """Bucle original (antes de vectorizar): un cruce como mucho por intervalo."""
+    crossings = []
+    for i in range(len(signal) - 1):
+        y1 = signal[i]
+        y2 = signal[i + 1]
+        if y1 == 0 and y2 == 0:
+            continue
+        if y1 == 0:
+            crossings.append(float(times[i]))
+            continue
+        if y2 == 0:
+            crossings.append(float(times[i + 1]))
+            continue
+        if y1 * y2 < 0:
+            frac = -y1 / (y2 - y1)
+            if 0 <= frac <= 1:
+                crossings.append(float(times[i] + frac * (times[i + 1] - times[i])))
+    return crossings
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_zero_crossings_matches_reference_loop(seed):
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.uniform(0.01, 0.05, 300))
+    # redondeado para que haya ceros exactos, también consecutivos
+    signal = np.round(np.sin(times * rng.uniform(3, 12)) + rng.normal(0, 0.1, times.size), 1)
+    assert pp._zero_crossings(times, signal) == _zero_crossings_reference(times, signal)
+
+
+@pytest.mark.parametrize("signal", [[], [1.0], [0.0, 0.0, 0.0], [1.0, 0.0, -1.0], [0.0, 1.0, -1.0, 0.0]])
+def test_zero_crossings_edge_cases_match_reference_loop(signal):
+    times = np.arange(len(signal), dtype=np.float64) * 0.1
+    assert pp._zero_crossings(times, signal) == _zero_crossings_reference(times, signal)
+
+
+def _savgol_reference(values, polyorder=3):
+    """_savgol_or_original antes de cachear los coeficientes (savgol_filter completo)."""
+    from scipy.signal import savgol_filter
+
+    count = len(values)
+    if count < polyorder + 2:
+        return np.array(values)
+    window = 41 if count > 50 else 9
+    if window >= count:
+        window = count if count % 2 == 1 else count - 1
+    if window < polyorder + 2:
+        return np.array(values)
+    return savgol_filter(values, window_length=window, polyorder=polyorder)
+
+
+@pytest.mark.parametrize("count", [3, 5, 6, 8, 9, 10, 30, 50, 51, 52, 200])
+def test_savgol_matches_scipy_savgol_filter(count):
+    values = 300 + 80 * np.sin(np.arange(count) * 0.3) + np.random.default_rng(count).normal(0, 2, count)
+    np.testing.assert_allclose(pp._savgol_or_original(values), _savgol_reference(values), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize(
+    "message",
+    ['{"frame": ""}', '  \n{"frame": ""}', "", " ", "/9j/4AAQ", "[1]", b'{"frame": ""}', b'\t{"frame": ""}', b"", b"\xff\xd8\xff", None],
+)
+def test_is_json_message_matches_lstrip_check(message):
+    # comprobación original: lstrip() de todo el mensaje (texto o binario)
+    if isinstance(message, str):
+        expected = message.lstrip().startswith("{")
+    elif isinstance(message, bytes):
+        expected = message.lstrip().startswith(b"{")
+    else:
+        expected = False
+    assert pp.is_json_message(message) is expected
+
+
+@pytest.mark.parametrize("typed_decoder", [True, False], ids=["msgspec", "json"])
+def test_decode_ws_message_accepts_every_input_format(monkeypatch, synthetic_frame, typed_decoder):
+    if not typed_decoder:
+        monkeypatch.setattr(pp, "_ws_decoder", None)
+    _, jpeg = cv2.imencode(".jpg", synthetic_frame(0.0))
+    jpeg = jpeg.tobytes()
+    b64 = base64.b64encode(jpeg).decode("ascii")
+    text = json.dumps({"frame": b64, "fps": "30", "timestamp": 0.5, "session_id": "s1"})
+
+    for message in (text, " " + text, text.encode("utf-8")):
+        frame, fps, timestamp, session_id = pp.decode_ws_message(message)
+        assert frame.shape == (480, 640, 3)
+        assert (fps, timestamp, session_id) == (30.0, 0.5, "s1")
+
+    for message in (jpeg, b64):
+        frame, fps, timestamp, session_id = pp.decode_ws_message(message)
+        assert frame.shape == (480, 640, 3)
+        assert (fps, timestamp, session_id) == (None, None, None)
+
+
+def test_encode_ws_message_framing(synthetic_frame):
+    header = {"info": {"x": 1.0}, "session_id": "s1"}
+    message = pp.encode_ws_message(synthetic_frame(0.0), header)
+    (header_len,) = struct.unpack_from("<I", message)
+    assert json.loads(message[4:4 + header_len]) == header
+    frame = cv2.imdecode(np.frombuffer(message[4 + header_len:], np.uint8), cv2.IMREAD_COLOR)
+    assert frame.shape == (480, 640, 3)
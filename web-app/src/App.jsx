@@ -194,11 +194,29 @@ function App() {
       URL.revokeObjectURL(backendUrlRef.current)
       backendUrlRef.current = ''
     }
-    const blob = data instanceof Blob ? data : new Blob([data], { type: 'image/jpeg' })
+    // Mensaje enmarcado: <uint32 LE len> + header JSON + JPEG. Un JPEG suelto empieza por FF D8.
+    let image = data
+    let header = null
+    if (data instanceof ArrayBuffer && data.byteLength > 4) {
+      const bytes = new Uint8Array(data)
+      if (!(bytes[0] === 0xff && bytes[1] === 0xd8)) {
+        const headerLen = new DataView(data).getUint32(0, true)
+        if (4 + headerLen <= bytes.length) {
+          try {
+            header = JSON.parse(new TextDecoder().decode(bytes.subarray(4, 4 + headerLen)))
+            image = bytes.subarray(4 + headerLen)
+          } catch {
+            header = null
+          }
+        }
+      }
+    }
+    const blob = image instanceof Blob ? image : new Blob([image], { type: 'image/jpeg' })
     const objectUrl = URL.createObjectURL(blob)
     backendUrlRef.current = objectUrl
     setBackendFrame(objectUrl)
-  }, [])
+    if (header) handleBackendPayload(null, header.info)
+  }, [handleBackendPayload])
 
   const handleMessage = useCallback(
     (event) => {